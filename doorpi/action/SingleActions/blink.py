@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from action.base import SingleAction
+import doorpi
+
+def blink(pin, on_ms, off_ms, count):
+    keyboard = doorpi.DoorPi().keyboard
+    if on_ms <= 0: return keyboard.stop_pattern(pin, 0)
+    return keyboard.blink(pin, on_ms, off_ms, count)
+
+# blink:pin,on_ms[,off_ms[,count]] - count 0 blinks until the next blink of the pin, on_ms 0 stops and switches off
+arguments = [('pin', int), ('on_ms', int)]
+optional_arguments = [('off_ms', int), ('count', int)]
+
+def get(parameters):
+    parameter_list = parameters.split(',')
+    if len(parameter_list) not in [2, 3, 4]: return None
+
+    pin = int(parameter_list[0])
+    on_ms = int(parameter_list[1])
+    off_ms = int(parameter_list[2]) if len(parameter_list) > 2 else on_ms
+    count = int(parameter_list[3]) if len(parameter_list) > 3 else 0
+
+    return BlinkAction(blink,
+        pin = pin,
+        on_ms = on_ms,
+        off_ms = off_ms,
+        count = count
+    )
+
+class BlinkAction(SingleAction):
+    pass
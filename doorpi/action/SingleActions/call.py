@@ -14,6 +14,8 @@ def make_call(Number):
     doorpi.DoorPi().sipphone.lib.thread_register('make_call_theard')
     doorpi.DoorPi().sipphone.make_call(Number)
 
+arguments = [('number', str)]
+
 def get(parameters):
     parameter_list = parameters.split(',')
     if len(parameter_list) is not 1: return None
@@ -9,6 +9,10 @@ from action.base import SingleAction
 import doorpi
 from out_triggered import get as fallback_out_triggered
 
+# with 4 or 5 arguments out_triggered is used: pin,start_value,end_value,timeout[,stop_pin]
+arguments = [('pin', int), ('value', str)]
+optional_arguments = [('log_output', str), ('timeout', float), ('stop_pin', str)]
+
 def get(parameters):
     parameter_list = parameters.split(',')
     if len(parameter_list) > 3: return fallback_out_triggered(parameters)
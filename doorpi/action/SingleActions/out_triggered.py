@@ -5,32 +5,95 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
-from time import sleep
+import threading
 
 from action.base import SingleAction
 import doorpi
 
+# pin -> running OutputPulse - a new pulse on the same pin replaces the running one
+pulses = {}
+pulses_lock = threading.Lock()
+
+class OutputPulse(object):
+    """ start_value now, end_value after timeout seconds or at the first edge of stop_pin
+
+    No thread waits for the end - one job of the scheduler writes the
+    end value and the edge callback of the keyboard ends the pulse early.
+    """
+
+    def __init__(self, keyboard, scheduler, pin, end_value, stop_pin = None):
+        self.__keyboard = keyboard
+        self.__scheduler = scheduler
+        self.__pin = pin
+        self.__end_value = end_value
+        self.__stop_pin = stop_pin
+        self.__job = None
+        self.__lock = threading.Lock()
+        self.__finished = False
+
+    def start(self, start_value, timeout):
+        with pulses_lock:
+            running = pulses.get(self.__pin)
+            pulses[self.__pin] = self
+        # the new pulse sets the pin anyway - the running one must not write its end value in between
+        if running is not None: running.cancel()
+
+        self.__keyboard.set_output(self.__pin, start_value)
+        if self.__stop_pin is not None:
+            self.__keyboard.register_edge_callback(self.__stop_pin, self.stop_pin_pressed)
+            # one read for a stop pin that is already held - everything else is an edge
+            if self.__keyboard.status_inputpin(self.__stop_pin): return self.finish()
+        with self.__lock:
+            if self.__finished: return True
+            self.__job = self.__scheduler.add_job_in(timeout, self.finish, name = 'out_triggered pin %s' % self.__pin)
+        # the scheduler is already destroyed (shutdown) - end the pulse at once instead of never
+        if self.__job is None: return self.finish()
+        return True
+
+    def stop_pin_pressed(self, pin):
+        logger.debug('stop pin %s pressed - end pulse on pin %s', pin, self.__pin)
+        self.finish()
+
+    def cancel(self):
+        with self.__lock:
+            if self.__finished: return False
+            self.__finished = True
+            self.__scheduler.cancel_job(self.__job)
+        if self.__stop_pin is not None:
+            self.__keyboard.unregister_edge_callback(self.__stop_pin, self.stop_pin_pressed)
+        with pulses_lock:
+            if pulses.get(self.__pin) is self: del pulses[self.__pin]
+        return True
+
+    def finish(self):
+        if not self.cancel(): return False
+        return self.__keyboard.set_output(self.__pin, self.__end_value)
+
 def out_triggered(pin, start_value, end_value, timeout, stop_pin):
-    doorpi.DoorPi().keyboard.set_output(pin, start_value)
-    while timeout > 0 and stop_pin not in doorpi.DoorPi().keyboard.pressed_keys:
-        sleep(0.1)
-        timeout -= 0.1
-    doorpi.DoorPi().keyboard.set_output(pin, end_value)
-    return True
+    keyboard = doorpi.DoorPi().keyboard
+    pin = int(pin)
+    if stop_pin is not None and int(stop_pin) not in keyboard.input_pins:
+        logger.warning('stop pin %s is no input pin - pulse on pin %s runs for %s seconds', stop_pin, pin, timeout)
+        stop_pin = None
+    pulse = OutputPulse(keyboard, doorpi.DoorPi().scheduler, pin, end_value, int(stop_pin) if stop_pin is not None else None)
+    return pulse.start(start_value, timeout)
+
+arguments = [('pin', int), ('start_value', str), ('end_value', str), ('timeout', float)]
+optional_arguments = [('stop_pin', str)]
 
 def get(parameters):
     parameter_list = parameters.split(',')
-    if len(parameter_list) is not 4 and not 5: return None
+    if len(parameter_list) not in [4, 5]: return None
 
     pin = parameter_list[0]
     start_value = parameter_list[1]
     end_value = parameter_list[2]
     timeout = float(parameter_list[3])
 
-    if len(parameters) == 5:
+    if len(parameter_list) == 5:
         stop_pin = parameter_list[4]
     else:
-        stop_pin = 'NoStopPinSet'
+        stop_pin = None
 
     return OutTriggeredAction(out_triggered,
         pin = pin,
@@ -14,6 +14,8 @@ def make_call(timeout):
     doorpi.DoorPi().sipphone.lib.thread_register('pjsip_handle_events')
     doorpi.DoorPi().sipphone.lib.handle_events(timeout)
 
+arguments = [('timeout', int)]
+
 def get(parameters):
     parameter_list = parameters.split(',')
     if len(parameter_list) is not 1: return None
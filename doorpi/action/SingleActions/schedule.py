@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from action.base import SingleAction
+from action.cron import CronExpression, CronExpressionError
+import doorpi
+
+scheduled_jobs = {}
+
+def schedule(cron_expression, event_name):
+    if event_name in scheduled_jobs: return True
+    doorpi.DoorPi().event_handler.register_event(event_name, __name__)
+    scheduled_jobs[event_name] = doorpi.DoorPi().scheduler.add_cron_job(
+        cron_expression,
+        doorpi.DoorPi().event_handler.fire_event_asynchron,
+        (event_name, __name__),
+        name = event_name
+    )
+    logger.debug('scheduled %s', scheduled_jobs[event_name])
+    return scheduled_jobs[event_name] is not None
+
+def unschedule(event_name):
+    job = scheduled_jobs.pop(event_name, None)
+    if job is None: return False
+    doorpi.DoorPi().scheduler.cancel_job(job)
+    doorpi.DoorPi().event_handler.unregister_event(event_name, __name__, False)
+    logger.debug('unscheduled %s', event_name)
+    return True
+
+def unschedule_all_except(event_names):
+    """ used by reload_config - cancels the jobs of cron expressions that are gone """
+    for event_name in set(scheduled_jobs) - set(event_names): unschedule(event_name)
+
+arguments = [('cron_expression', str)]
+split_parameters = False
+
+def get(parameters):
+    # cron expressions may contain commas - use the whole parameter string
+    cron_expression = parameters.strip().strip('"')
+    try: cron_expression = CronExpression(cron_expression)
+    except CronExpressionError as ex:
+        logger.error('invalid cron expression %s: %s', parameters, ex)
+        return None
+
+    event_name = 'OnSchedule_' + str(cron_expression)
+    schedule_action = ScheduleAction(schedule,
+        cron_expression = cron_expression,
+        event_name = event_name
+    )
+    schedule_action.event_name = event_name
+    return schedule_action
+
+class ScheduleAction(SingleAction):
+    event_name = None
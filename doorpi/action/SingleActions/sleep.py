@@ -8,6 +8,8 @@ logger.debug("%s loaded", __name__)
 from time import sleep as callback_function
 from action.base import SingleAction
 
+arguments = [('seconds', float)]
+
 def get(parameters):
     parameter_list = parameters.split(',')
     if len(parameter_list) is not 1: return None
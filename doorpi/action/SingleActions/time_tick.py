@@ -49,6 +49,8 @@ def time_tick(time_unit):
 
     return True
 
+arguments = [('time_unit', str)]
+
 def get(parameters):
     parameter_list = parameters.split(',')
     if len(parameter_list) is not 1: return None
@@ -56,33 +58,7 @@ def get(parameters):
     time_unit = parameter_list[0]
 
     # register timebased_events
-    doorpi.DoorPi().event_handler.register_event('OnTimeSecond', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeSecondEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeSecondUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeMinute', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeMinuteEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeMinuteUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeHour', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeHourEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeHourUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeDay', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeDayEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeDayUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeWeek', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeWeekEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeWeekUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeMonth', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeMonthEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeMonthUnevenNumber', __name__)
-
-    doorpi.DoorPi().event_handler.register_event('OnTimeYear', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeYearEvenNumber', __name__)
-    doorpi.DoorPi().event_handler.register_event('OnTimeYearUnevenNumber', __name__)
+    doorpi.DoorPi().event_handler.register_event('~OnTime*', __name__)
 
     return TimeTickAction(time_tick, time_unit)
 
@@ -6,7 +6,7 @@ logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
 from time import sleep
-import importlib
+import doorpi
 
 class SingleAction:
     action_name = None
@@ -56,11 +56,4 @@ class SingleAction:
 
     @staticmethod
     def from_string(config_string):
-        #try:
-            action_name = config_string.split(':', 1)[0]
-            return importlib.import_module('action.SingleActions.'+action_name).get(
-                config_string.split(':', 1)[1]
-            )
-        #except:
-        #    logger.exception('error while creating SingleAction from config string: %s',config_string)
-        #    return None
\ No newline at end of file
+        return doorpi.DoorPi().action_registry.create_action(config_string)
\ No newline at end of file
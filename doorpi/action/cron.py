@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import time
+import datetime
+
+ALIASES = {
+    '@yearly':      '0 0 1 1 *',
+    '@annually':    '0 0 1 1 *',
+    '@monthly':     '0 0 1 * *',
+    '@weekly':      '0 0 * * 0',
+    '@daily':       '0 0 * * *',
+    '@midnight':    '0 0 * * *',
+    '@hourly':      '0 * * * *'
+}
+
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+# search for the next match ends after this many years (e.g. for 30th of february)
+MAX_YEARS = 5
+
+class CronExpressionError(Exception): pass
+
+def parse_value(value, names, offset, field):
+    value = value.lower()
+    if value in names: return names.index(value) + offset
+    try: return int(value)
+    except ValueError: raise CronExpressionError('unknown value %s in %s' % (value, field))
+
+def parse_field(field, minimum, maximum, names = []):
+    values = set()
+    for part in field.split(','):
+        if '/' in part:
+            part, step = part.split('/', 1)
+            try: step = int(step)
+            except ValueError: raise CronExpressionError('step %s is no number in %s' % (step, field))
+            if step < 1: raise CronExpressionError('step has to be greater than 0 in %s' % field)
+        else:
+            step = 1
+
+        if part == '*':
+            start, end = minimum, maximum
+        elif '-' in part:
+            start, end = part.split('-', 1)
+            start, end = parse_value(start, names, minimum, field), parse_value(end, names, minimum, field)
+        else:
+            start = parse_value(part, names, minimum, field)
+            end = maximum if step is not 1 else start
+
+        if start < minimum or end > maximum or start > end:
+            raise CronExpressionError('%s is out of range %s-%s' % (part, minimum, maximum))
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+class CronExpression(object):
+    """ classic five fields: minute hour day_of_month month day_of_week
+
+    Supports *, lists (1,15), ranges (1-5), steps (*/10, 8-18/2),
+    month and day names (jan, mon) and the aliases @hourly, @daily, ...
+    """
+
+    @property
+    def expression(self): return self.__expression
+
+    def __init__(self, expression):
+        self.__expression = expression.strip()
+        fields = ALIASES.get(self.__expression.lower(), self.__expression).split()
+        if len(fields) is not 5:
+            raise CronExpressionError('cron expression "%s" needs 5 fields' % expression)
+
+        self.__minutes = parse_field(fields[0], 0, 59)
+        self.__hours = parse_field(fields[1], 0, 23)
+        self.__days = parse_field(fields[2], 1, 31)
+        self.__months = parse_field(fields[3], 1, 12, MONTH_NAMES)
+        # 0 and 7 are both sunday
+        self.__weekdays = frozenset(day % 7 for day in parse_field(fields[4], 0, 7, DAY_NAMES))
+        self.__any_day = fields[2] == '*'
+        self.__any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.__expression
+
+    def match_day(self, dt):
+        day_match = dt.day in self.__days
+        # python: monday is 0 - cron: sunday is 0
+        weekday_match = (dt.weekday() + 1) % 7 in self.__weekdays
+        if self.__any_day: return weekday_match
+        if self.__any_weekday: return day_match
+        # both restricted -> cron fires if one of them matches
+        return day_match or weekday_match
+
+    def next_fire(self, timestamp):
+        """ returns the first timestamp strictly after the given one or None """
+        dt = datetime.datetime.fromtimestamp(timestamp).replace(second = 0, microsecond = 0)
+        dt += datetime.timedelta(minutes = 1)
+        last_year = dt.year + MAX_YEARS
+
+        while dt.year <= last_year:
+            if dt.month not in self.__months:
+                if dt.month == 12: dt = datetime.datetime(dt.year + 1, 1, 1)
+                else: dt = datetime.datetime(dt.year, dt.month + 1, 1)
+                continue
+            if not self.match_day(dt):
+                dt = dt.replace(hour = 0, minute = 0) + datetime.timedelta(days = 1)
+                continue
+            if dt.hour not in self.__hours:
+                dt = dt.replace(minute = 0) + datetime.timedelta(hours = 1)
+                continue
+            if dt.minute not in self.__minutes:
+                dt += datetime.timedelta(minutes = 1)
+                continue
+            return time.mktime(dt.timetuple())
+        return None
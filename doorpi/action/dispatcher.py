@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import collections
+import time # used by: PoolDispatcher.dispatch
+
+import doorpi
+
+OVERFLOW_POLICIES = ['block', 'drop_oldest', 'drop_new']
+
+def load_dispatcher():
+    dispatchers = dict(
+        thread = ThreadDispatcher,
+        pool = PoolDispatcher
+    )
+
+    config_value = doorpi.DoorPi().config.get('EventHandler', 'dispatcher', 'pool')
+    if config_value not in dispatchers.keys():
+        raise Exception(
+            'Dispatcher {0} in configfile is unknown. - possible values are {1}'.format(
+            config_value, dispatchers.keys())
+        )
+
+    if config_value == 'thread': return ThreadDispatcher()
+    return PoolDispatcher(
+        workers = doorpi.DoorPi().config.get_int('EventHandler', 'workers', 4),
+        queue_size = doorpi.DoorPi().config.get_int('EventHandler', 'queue_size', 64),
+        overflow = doorpi.DoorPi().config.get('EventHandler', 'overflow', 'block')
+    )
+
+class ThreadDispatcher(object):
+    """ old behaviour: one new thread for every asynchronous event """
+    name = 'thread'
+
+    @property
+    def idle(self): return True
+
+    @property
+    def status(self): return {'name': self.name}
+
+    def dispatch(self, key, callback, args, name = None, daemon = False):
+        t = threading.Thread(target = callback, args = args, name = name)
+        t.daemon = daemon
+        t.start()
+        return True
+
+    def destroy(self):
+        pass
+
+def run_job(job):
+    key, callback, args, enqueued, name = job
+    try: callback(*args)
+    except: logger.exception('error while running job %s', name)
+
+class PoolWorker(threading.Thread):
+
+    def __init__(self, index, pool):
+        threading.Thread.__init__(self, name = 'EventHandler worker %s' % index)
+        self.daemon = True
+        self.__pool = pool
+
+    def run(self):
+        while True:
+            job = self.__pool.take_job(self.name)
+            if job is None: return
+            try: run_job(job)
+            finally: self.__pool.job_done(job)
+
+class PoolDispatcher(object):
+    """ fixed number of workers that share one bounded queue
+
+    A free worker takes the oldest job whose key (the event name) is not
+    running on another worker - events of one kind are processed in the
+    order they were fired, a slow event only holds back events of its
+    own kind. A worker never waits for the full queue (all workers could
+    wait for each other) - its jobs are queued beyond the limit instead,
+    behind the queued jobs of the same kind.
+    """
+    name = 'pool'
+
+    @property
+    def idle(self): return not self.__queue and not self.__running
+
+    @property
+    def status(self):
+        running = dict((worker_name, key) for key, worker_name in self.__running.items())
+        return {
+            'name': self.name,
+            'overflow': self.__overflow,
+            'queue_size': self.__queue_size,
+            'queue_length': len(self.__queue),
+            'dropped': self.__dropped,
+            'over_limit': self.__over_limit,
+            'workers': [{
+                'name': worker.name,
+                'busy': worker.name in running,
+                'event': running.get(worker.name)
+            } for worker in self.__workers]
+        }
+
+    def __init__(self, workers = 4, queue_size = 64, overflow = 'block'):
+        logger.debug("__init__(workers = %s, queue_size = %s, overflow = %s)", workers, queue_size, overflow)
+        if overflow not in OVERFLOW_POLICIES:
+            raise Exception(
+                'overflow policy {0} is unknown - possible values are {1}'.format(
+                overflow, OVERFLOW_POLICIES)
+            )
+        if workers < 1 or queue_size < 1:
+            raise Exception('workers and queue_size have to be greater than 0')
+
+        self.__queue_size = queue_size
+        self.__overflow = overflow
+        self.__queue = collections.deque()
+        self.__running = {} # key -> name of the worker
+        self.__dropped = 0
+        self.__over_limit = 0
+        self.__condition = threading.Condition()
+        self.__destroy = False
+        self.__workers = [PoolWorker(i, self) for i in range(workers)]
+        for worker in self.__workers: worker.start()
+
+    def dispatch(self, key, callback, args, name = None, daemon = False):
+        job = (key, callback, args, time.time(), name)
+        with self.__condition:
+            if len(self.__queue) >= self.__queue_size:
+                if self.__overflow == 'drop_new':
+                    self.__dropped += 1
+                    logger.warning('event queue is full - drop new job %s', name)
+                    return False
+                if self.__overflow == 'drop_oldest':
+                    self.__dropped += 1
+                    logger.warning('event queue is full - drop oldest job %s', self.__queue.popleft()[4])
+                elif threading.current_thread() in self.__workers:
+                    self.__over_limit += 1
+                    logger.debug('event queue is full - queue job %s of a worker beyond the limit', name)
+                else:
+                    while len(self.__queue) >= self.__queue_size and not self.__destroy:
+                        self.__condition.wait()
+            self.__queue.append(job)
+            self.__condition.notify_all()
+        return True
+
+    def take_job(self, worker_name):
+        """ next job for a worker - None when the dispatcher is destroyed and the queue is empty """
+        with self.__condition:
+            while True:
+                for index, job in enumerate(self.__queue):
+                    if job[0] in self.__running: continue
+                    del self.__queue[index]
+                    self.__running[job[0]] = worker_name
+                    self.__condition.notify_all()
+                    return job
+                if self.__destroy and not self.__queue: return None
+                # no timeout - python 2 would poll the lock while waiting with one
+                self.__condition.wait()
+
+    def job_done(self, job):
+        with self.__condition:
+            del self.__running[job[0]]
+            self.__condition.notify_all()
+
+    def destroy(self):
+        logger.debug("destroy")
+        with self.__condition:
+            self.__destroy = True
+            self.__condition.notify_all()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from fnmatch import fnmatchcase # used by: EventPatternTrie.match
+
+WILDCARDS = '*?['
+# only names with this prefix are patterns (~OnCallState*) - other event names are
+# literal even with wildcards in them, like the DTMF code of OnDTMF_"**66*"
+PATTERN_PREFIX = '~'
+
+def is_pattern(event_name):
+    return event_name.startswith(PATTERN_PREFIX)
+
+def pattern_of(event_name):
+    """ the glob of a marked event name - ~OnCallState* -> OnCallState* """
+    return event_name[len(PATTERN_PREFIX):]
+
+def literal_prefix(pattern):
+    for index, char in enumerate(pattern):
+        if char in WILDCARDS: return pattern[:index]
+    return pattern
+
+class EventPatternNode(object):
+    __slots__ = ('children', 'patterns')
+
+    def __init__(self):
+        self.children = {}
+        self.patterns = {} # pattern -> [values]
+
+class EventPatternTrie(object):
+    """ glob patterns for event names (e.g. OnCallState*, OnKeyPressed_*) - without PATTERN_PREFIX
+
+    Every pattern is stored at the node of its literal prefix. A fired
+    event name only walks its own characters down the trie, so patterns
+    with other prefixes are never looked at. Patterns like 'OnKey*' match
+    by position alone, all others are checked with fnmatch.
+    """
+
+    __patterns = {}
+    @property
+    def patterns(self): return self.__patterns
+
+    def __init__(self):
+        self.__root = EventPatternNode()
+        self.__patterns = {}
+
+    def __len__(self):
+        return len(self.__patterns)
+
+    def node_for(self, prefix, create = False):
+        node = self.__root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                if not create: return None
+                child = node.children[char] = EventPatternNode()
+            node = child
+        return node
+
+    def add(self, pattern, value):
+        node = self.node_for(literal_prefix(pattern), True)
+        values = node.patterns.setdefault(pattern, [])
+        if value not in values: values.append(value)
+        self.__patterns[pattern] = values
+
+    def remove(self, pattern, value):
+        node = self.node_for(literal_prefix(pattern))
+        if node is None or pattern not in node.patterns: return False
+        values = node.patterns[pattern]
+        if value not in values: return False
+        values.remove(value)
+        if not values:
+            del node.patterns[pattern]
+            del self.__patterns[pattern]
+        return True
+
+    def values(self, pattern):
+        return self.__patterns.get(pattern, [])
+
+    def match(self, event_name):
+        matches = []
+        if not self.__patterns: return matches
+        node = self.__root
+        depth = 0
+        while node is not None:
+            for pattern, values in list(node.patterns.items()):
+                if pattern[depth:] == '*' or fnmatchcase(event_name, pattern):
+                    matches.extend(values)
+            if depth == len(event_name): break
+            node = node.children.get(event_name[depth])
+            depth += 1
+        return matches
@@ -10,6 +10,10 @@ import time # used by: fire_event_synchron
 from inspect import isfunction, ismethod # used by: register_action
 
 from base import SingleAction
+from dispatcher import ThreadDispatcher
+from history import EventHistory
+from event_patterns import EventPatternTrie, is_pattern, pattern_of
+from status.metrics import metrics
 
 class EnumWaitSignalsClass():
     WaitToFinish = True
@@ -25,58 +29,143 @@ EnumWaitSignals = EnumWaitSignalsClass()
 
 class EventHandler:
 
-    __Sources = [] # Auflistung Sources
+    __Sources = set() # Auflistung Sources
     __Events = {} # Zuordnung Event zu Sources (1 : n)
+    __Sources_Events = {} # Zuordnung Source zu Events (1 : n) - Gegenstück zu __Events
     __Actions = {} # Zuordnung Event zu Actions (1: n)
+    # Events und Actions mit Wildcards (z.B. ~OnCallState*) - the tries hold the globs without ~
+    __Event_Patterns = EventPatternTrie()
+    __Action_Patterns = EventPatternTrie()
 
-    __additional_informations = {}
+    # register and unregister keep __Events and __Sources_Events in sync
+    __lock = threading.RLock()
+
+    __action_listeners = []
+    __fire_listeners = []
+    __finish_listeners = []
 
     @property
     def sources(self): return self.__Sources
     @property
     def events(self): return self.__Events
     @property
-    def events_by_source(self):
-        events_by_source = {}
-        for event in self.events:
-            for source in self.events[event]:
-                if source in events_by_source:
-                    events_by_source[source].append(event)
-                else:
-                    events_by_source[source] = [event]
-        return events_by_source
+    def events_by_source(self): return self.__Sources_Events
     @property
     def actions(self): return self.__Actions
     @property
+    def event_patterns(self): return self.__Event_Patterns.patterns
+    @property
+    def action_patterns(self): return self.__Action_Patterns.patterns
+    @property
     def threads(self): return threading.enumerate()
     @property
-    def idle(self): return len(self.threads) - 1 is 0
+    def idle(self):
+        if not self.__dispatcher.idle: return False
+        return len([t for t in self.threads if not t.daemon]) <= 1
+    @property
+    def additional_informations(self): return self.__history.latest()
+
+    __history = EventHistory()
+    @property
+    def history(self): return self.__history
+
+    __dispatcher = ThreadDispatcher()
     @property
-    def additional_informations(self): return self.__additional_informations
+    def dispatcher(self): return self.__dispatcher
 
     __destroy = False
 
     def destroy(self, force_destroy = False):
         self.__destroy = True
+        self.__dispatcher.destroy()
+
+    def set_dispatcher(self, dispatcher):
+        logger.debug("use dispatcher %s", dispatcher.name)
+        old_dispatcher = self.__dispatcher
+        self.__dispatcher = dispatcher
+        old_dispatcher.destroy()
+
+    def set_history(self, history):
+        logger.debug("keep the last %s records per event", history.depth)
+        self.__history = history
 
     def register_source(self, event_source):
         logger.trace("register Eventsource %s ",event_source)
-        if event_source not in self.__Sources:
-            self.__Sources.append(event_source)
-            logger.debug("event_source %s was added", event_source)
-        else:
-            logger.debug("event_source %s was allready known", event_source)
+        with self.__lock:
+            if event_source not in self.__Sources:
+                self.__Sources.add(event_source)
+                self.__Sources_Events[event_source] = set()
+                logger.debug("event_source %s was added", event_source)
+            else:
+                logger.debug("event_source %s was allready known", event_source)
 
     def register_event(self, event_name, event_source):
         logger.trace("register Event %s from %s ", event_name, event_source)
-        self.register_source(event_source)
-        if event_name not in self.__Events:
-            self.__Events[event_name] = [event_source]
-            logger.trace("added event_name %s an register source %s", event_name, event_source)
-        elif event_source not in self.__Events[event_name]:
-            self.__Events[event_name].append(event_source)
-            logger.trace("added event_source %s to existing event %s", event_source, event_name)
-        else: logger.trace("nothing to do - event %s from source %s is allready known", event_name, event_source)
+        with self.__lock:
+            self.register_source(event_source)
+            if is_pattern(event_name):
+                self.__Event_Patterns.add(pattern_of(event_name), event_source)
+                logger.trace("added event pattern %s for source %s", event_name, event_source)
+            elif event_name not in self.__Events:
+                self.__Events[event_name] = set([event_source])
+                logger.trace("added event_name %s an register source %s", event_name, event_source)
+            elif event_source not in self.__Events[event_name]:
+                self.__Events[event_name].add(event_source)
+                logger.trace("added event_source %s to existing event %s", event_source, event_name)
+            else: logger.trace("nothing to do - event %s from source %s is allready known", event_name, event_source)
+            self.__Sources_Events[event_source].add(event_name)
+
+    def has_actions(self, event_name):
+        if event_name in self.__Actions: return True
+        return len(self.__Action_Patterns.match(event_name)) > 0
+
+    def get_actions(self, event_name):
+        actions = self.__Actions.get(event_name, [])
+        if not self.__Action_Patterns: return actions
+        return actions + self.__Action_Patterns.match(event_name)
+
+    def source_knows_event(self, event_name, event_source):
+        event_sources = self.__Events.get(event_name)
+        if event_sources is not None and event_source in event_sources: return True
+        if not self.__Event_Patterns: return False
+        return event_source in self.__Event_Patterns.match(event_name)
+
+    def has_actions_for_any(self, event_names):
+        for event_name in event_names:
+            if self.has_actions(event_name): return True
+        return False
+
+    def register_action_listener(self, callback):
+        if callback not in self.__action_listeners:
+            self.__action_listeners.append(callback)
+
+    def register_fire_listener(self, callback):
+        """ callback(event_name, event_source, kwargs) for every valid fired event (with or without actions) - has to return quickly """
+        if callback not in self.__fire_listeners:
+            self.__fire_listeners.append(callback)
+
+    def unregister_fire_listener(self, callback):
+        if callback in self.__fire_listeners:
+            self.__fire_listeners.remove(callback)
+
+    def register_finish_listener(self, callback):
+        """ callback(record, results) after the actions of a fired event - results are (action_name, failed, duration) """
+        if callback not in self.__finish_listeners:
+            self.__finish_listeners.append(callback)
+
+    def unregister_finish_listener(self, callback):
+        if callback in self.__finish_listeners:
+            self.__finish_listeners.remove(callback)
+
+    def notify_finish_listeners(self, record, results):
+        for listener in self.__finish_listeners:
+            try: listener(record, results)
+            except: logger.exception("error while calling finish listener %s for event_name %s", listener, record.event_name)
+
+    def notify_fire_listeners(self, event_name, event_source, kwargs):
+        for listener in self.__fire_listeners:
+            try: listener(event_name, event_source, kwargs)
+            except: logger.exception("error while calling fire listener %s for event_name %s", listener, event_name)
 
     def fire_event(self, event_name, event_source, syncron = False, kwargs = None):
         if syncron: return self.fire_event_synchron(event_name, event_source, kwargs)
@@ -85,81 +174,105 @@ class EventHandler:
     def fire_event_asynchron(self, event_name, event_source, kwargs = None):
         silent = 'OnTime' in event_name
         if not silent: logger.trace("fire Event %s from %s asyncron", event_name, event_source)
-        threading.Thread(
-            target = self.fire_event_synchron,
-            args = (event_name, event_source, kwargs),
+        return self.__dispatcher.dispatch(
+            key = event_name,
+            callback = self.fire_event_dispatched,
+            args = (event_name, event_source, kwargs, time.time()),
             name = "%s from %s" % (event_name, event_source)
-        ).start()
+        )
 
     def fire_event_asynchron_daemon(self, event_name, event_source, kwargs = None):
         logger.trace("fire Event %s from %s asyncron and as daemons", event_name, event_source)
-        t = threading.Thread(
-            target = self.fire_event_synchron,
-            args = (event_name, event_source, kwargs),
-            name = "daemon %s from %s" % (event_name, event_source)
+        return self.__dispatcher.dispatch(
+            key = event_name,
+            callback = self.fire_event_dispatched,
+            args = (event_name, event_source, kwargs, time.time()),
+            name = "daemon %s from %s" % (event_name, event_source),
+            daemon = True
         )
-        t.daemon = True
-        t.start()
+
+    def fire_event_dispatched(self, event_name, event_source, kwargs, dispatched):
+        if metrics.enabled: metrics.record_queue_delay(event_name, time.time() - dispatched)
+        return self.fire_event_synchron(event_name, event_source, kwargs)
 
     def fire_event_synchron(self, event_name, event_source, kwargs = None):
         if self.__destroy: return False
         silent = 'OnTime' in event_name
 
-        if event_source not in self.__Sources:
-            logger.warning('source %s unknown - skip fire_event %s', event_source, event_name)
-            return "source unknown"
-        if event_name not in self.__Events:
-            logger.warning('event %s unknown - skip fire_event %s from %s', event_name, event_name, event_source)
-            return "event unknown"
-        if event_source not in self.__Events[event_name]:
+        if not self.source_knows_event(event_name, event_source):
+            if event_source not in self.__Sources:
+                logger.warning('source %s unknown - skip fire_event %s', event_source, event_name)
+                return "source unknown"
+            if event_name not in self.__Events and not self.__Event_Patterns.match(event_name):
+                logger.warning('event %s unknown - skip fire_event %s from %s', event_name, event_name, event_source)
+                return "event unknown"
             logger.warning('event %s for this event - skip fire_event %s from %s', event_name, event_name, event_source)
             return "source unknown for this event"
-        if event_name not in self.__Actions:
+        metrics.increment('doorpi_events_fired', (('event', event_name),))
+        record = self.__history.add(event_name, event_source, kwargs)
+        actions = self.get_actions(event_name)
+        if not actions:
             if not silent: logger.debug('no actions for event %s - skip fire_event %s from %s', event_name, event_name, event_source)
+            self.notify_fire_listeners(event_name, event_source, kwargs)
+            self.notify_finish_listeners(record, [])
             return "no actions for this event"
 
-        if kwargs is None: kwargs = {}
-        kwargs.update({
-            'last_fired': str(time.time()),
-            'last_fired_from': event_source
-        })
-
-        self.__additional_informations[event_name] = kwargs
-        if 'last_finished' not in self.__additional_informations[event_name]:
-            self.__additional_informations[event_name]['last_finished'] = None
+        self.notify_fire_listeners(event_name, event_source, kwargs)
 
-        if not silent: logger.debug("fire for event %s this actions %s ", event_name, self.__Actions[event_name])
-        for action in self.__Actions[event_name]:
+        if not silent: logger.debug("fire for event %s this actions %s ", event_name, actions)
+        measure = metrics.enabled
+        results = [] if self.__finish_listeners else None
+        timed = measure or results is not None
+        if measure: event_start = time.time()
+        event_failed = False
+        for action in actions:
             if not silent: logger.trace("try to fire action %s", action)
+            if timed: action_start = time.time()
+            action_failed = False
             try: action.run(silent)
-            except: logger.exception("error while fire action %s for event_name %s", action, event_name)
+            except:
+                action_failed = event_failed = True
+                logger.exception("error while fire action %s for event_name %s", action, event_name)
+            metrics.increment('doorpi_actions_run', (('action', action.action_name),))
+            if action_failed: metrics.increment('doorpi_actions_failed', (('action', action.action_name),))
+            if timed: action_duration = time.time() - action_start
+            if measure: metrics.record_action(action.action_name, action_duration, action_failed)
+            if results is not None: results.append((action.action_name, action_failed, action_duration))
+        if measure: metrics.record_event(event_name, time.time() - event_start, event_failed)
         if not silent: logger.trace("finished fire_event for event_name %s", event_name)
-        self.__additional_informations[event_name]['last_finished'] = str(time.time())
+        record.finished = time.time()
+        if results is not None: self.notify_finish_listeners(record, results)
         return True
 
     def unregister_event(self, event_name, event_source, delete_source_when_empty = True):
         logger.trace("unregister Event %s from %s ", event_name, event_source)
-        if event_name not in self.__Events: return "event unknown"
-        if event_source not in self.__Events[event_name]: return "source not know for this event"
-        self.__Events[event_name].remove(event_source)
-        if len(self.__Events[event_name]) is 0:
-            del self.__Events[event_name]
-            logger.debug("no more sources for event %s - remove event too", event_name)
-        if delete_source_when_empty: self.unregister_source(event_source)
+        with self.__lock:
+            if is_pattern(event_name):
+                if not self.__Event_Patterns.remove(pattern_of(event_name), event_source): return "source not know for this event"
+                self.__Sources_Events[event_source].discard(event_name)
+            else:
+                if event_name not in self.__Events: return "event unknown"
+                if event_source not in self.__Events[event_name]: return "source not know for this event"
+                self.__Events[event_name].discard(event_source)
+                self.__Sources_Events[event_source].discard(event_name)
+                if len(self.__Events[event_name]) is 0:
+                    del self.__Events[event_name]
+                    logger.debug("no more sources for event %s - remove event too", event_name)
+            if delete_source_when_empty: self.unregister_source(event_source)
         logger.trace("event_source %s was removed for event %s", event_source, event_name)
         return True
 
     def unregister_source(self, event_source, force_unregister = False):
         logger.trace("unregister Eventsource %s and force_unregister is %s", event_source, force_unregister)
-        if event_source not in self.__Sources: return "event_source %s unknown" % (event_source)
-        for event_name in self.__Events.keys():
-            if event_source in self.__Events[event_name] and force_unregister:
+        with self.__lock:
+            if event_source not in self.__Sources: return "event_source %s unknown" % (event_source)
+            event_names = self.__Sources_Events[event_source]
+            if event_names and not force_unregister:
+                return "couldn't unregister event_source %s because it is used for event %s" % (event_source, next(iter(event_names)))
+            for event_name in list(event_names):
                 self.unregister_event(event_name, event_source, False)
-            elif event_source in self.__Events[event_name] and not force_unregister:
-                return "couldn't unregister event_source %s because it is used for event %s" % (event_source, event_name)
-        if event_source in self.__Sources:
-            # sollte nicht nötig sein, da es entfernt wird, wenn das letzte Event dafür gelöscht wird
-            self.__Sources.remove(event_source)
+            self.__Sources.discard(event_source)
+            del self.__Sources_Events[event_source]
         logger.trace("event_source %s was removed", event_source)
         return True
 
@@ -175,11 +288,39 @@ class EventHandler:
             logger.error('action_object is None')
             return False
 
-        if event_name in self.__Actions:
-            self.__Actions[event_name].append(action_object)
-            logger.trace("action %s was added to event %s", action_object, event_name)
-        else:
-            self.__Actions[event_name] = [action_object]
-            logger.trace("action %s was added to new evententry %s", action_object, event_name)
+        with self.__lock:
+            if is_pattern(event_name):
+                self.__Action_Patterns.add(pattern_of(event_name), action_object)
+                logger.trace("action %s was added to event pattern %s", action_object, event_name)
+            elif event_name in self.__Actions:
+                self.__Actions[event_name].append(action_object)
+                logger.trace("action %s was added to event %s", action_object, event_name)
+            else:
+                self.__Actions[event_name] = [action_object]
+                logger.trace("action %s was added to new evententry %s", action_object, event_name)
+
+        self.notify_action_listeners(event_name)
+        return action_object
+
+    def unregister_action(self, event_name, action_object):
+        with self.__lock:
+            if is_pattern(event_name):
+                if not self.__Action_Patterns.remove(pattern_of(event_name), action_object): return "action unknown for this event"
+            else:
+                actions = self.__Actions.get(event_name, [])
+                if action_object not in actions: return "action unknown for this event"
+                # a new list - fire_event_synchron may iterate the old one right now
+                actions = [action for action in actions if action is not action_object]
+                if actions: self.__Actions[event_name] = actions
+                else: del self.__Actions[event_name]
+            logger.trace("action %s was removed from event %s", action_object, event_name)
+
+        self.notify_action_listeners(event_name)
+        return True
+
+    def notify_action_listeners(self, event_name):
+        for listener in self.__action_listeners:
+            try: listener(event_name)
+            except: logger.exception("error while calling action listener %s for event_name %s", listener, event_name)
 
     __call__ = fire_event
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import collections
+import time
+
+import doorpi
+
+def load_event_history():
+    return EventHistory(
+        depth = doorpi.DoorPi().config.get_int('EventHandler', 'history_depth', 10),
+        max_events = doorpi.DoorPi().config.get_int('EventHandler', 'history_events', 256)
+    )
+
+class EventRecord(object):
+    __slots__ = ('event_name', 'timestamp', 'source', 'kwargs', 'finished')
+
+    def __init__(self, event_name, timestamp, source, kwargs):
+        self.event_name = event_name
+        self.timestamp = timestamp
+        self.source = source
+        self.kwargs = kwargs
+        self.finished = None
+
+    @property
+    def dictionary(self):
+        return {
+            'event_name': self.event_name,
+            'timestamp': self.timestamp,
+            'source': self.source,
+            'kwargs': self.kwargs,
+            'finished': self.finished
+        }
+
+    @property
+    def status(self):
+        # same keys as the old additional_informations
+        status = dict(self.kwargs or {})
+        status['last_fired'] = str(self.timestamp)
+        status['last_fired_from'] = self.source
+        status['last_finished'] = str(self.finished) if self.finished is not None else None
+        return status
+
+    def __str__(self):
+        return str(self.status)
+
+class EventHistory(object):
+    """ the last fired events - a ring buffer of depth records per event
+
+    Only max_events different event names are kept, the one that was
+    fired the longest time ago is dropped first. history[event_name]
+    is the newest record, so the history can be used as values of a
+    template (!OnKeyPressed_11!).
+    """
+
+    @property
+    def depth(self): return self.__depth
+
+    @property
+    def status(self):
+        return {
+            'depth': self.__depth,
+            'max_events': self.__max_events,
+            'events': len(self.__records)
+        }
+
+    def __init__(self, depth = 10, max_events = 256):
+        self.__depth = depth
+        self.__max_events = max_events
+        self.__records = collections.OrderedDict() # event_name -> deque, least recently fired first
+        self.__lock = threading.Lock()
+
+    def __contains__(self, event_name):
+        return event_name in self.__records
+
+    def __getitem__(self, event_name):
+        return self.__records[event_name][-1]
+
+    def keys(self):
+        with self.__lock:
+            return list(self.__records.keys())
+
+    def snapshot(self):
+        # OrderedDict is not safe to iterate while add() reorders it
+        with self.__lock:
+            return [(event_name, list(records)) for event_name, records in self.__records.items()]
+
+    def add(self, event_name, source, kwargs = None, timestamp = None):
+        record = EventRecord(event_name, timestamp or time.time(), source, kwargs)
+        with self.__lock:
+            records = self.__records.pop(event_name, None)
+            if records is None:
+                records = collections.deque(maxlen = self.__depth)
+                if len(self.__records) >= self.__max_events:
+                    dropped_event_name, dropped = self.__records.popitem(last = False)
+                    logger.trace('history of event %s dropped', dropped_event_name)
+            records.append(record)
+            self.__records[event_name] = records
+        return record
+
+    def clear(self):
+        with self.__lock:
+            self.__records.clear()
+
+    def last(self, event_name, count = 1):
+        """ the newest count records of event_name - newest first """
+        with self.__lock:
+            records = list(self.__records.get(event_name, []))
+        records.reverse()
+        return records[:count]
+
+    def since(self, timestamp, event_name = None):
+        """ all records fired after timestamp (of all events or only event_name) - oldest first """
+        records = []
+        for name, records_of_event in self.snapshot():
+            if event_name is not None and name != event_name: continue
+            for record in records_of_event:
+                if record.timestamp > timestamp: records.append(record)
+        records.sort(key = lambda record: record.timestamp)
+        return records
+
+    def recent(self, count = 10):
+        """ the newest count records of all events - newest first """
+        records = []
+        for event_name, records_of_event in self.snapshot():
+            records.extend(records_of_event)
+        records.sort(key = lambda record: record.timestamp, reverse = True)
+        return records[:count]
+
+    def latest(self):
+        """ newest record of every event as dict - the old additional_informations """
+        latest = {}
+        for event_name, records in self.snapshot():
+            latest[event_name] = records[-1].status
+        return latest
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import pkgutil # used by: ActionRegistry.discover_modules
+import importlib # used by: ActionRegistry.discover_modules
+
+import action.SingleActions
+
+ENTRY_POINT_GROUP = 'doorpi.actions'
+
+class ActionTypeError(Exception): pass
+
+def load_action_registry():
+    action_registry = ActionRegistry()
+    action_registry.discover_modules()
+    action_registry.discover_entry_points()
+    logger.info('available action types: %s', sorted(action_registry.action_types.keys()))
+    return action_registry
+
+class ActionType(object):
+    """ one kind of SingleAction (a module with a function get(parameters))
+
+    The module can describe its parameters with the lists arguments and
+    optional_arguments of (name, type) tuples. Modules without them are
+    not validated. split_parameters = False passes the whole parameter
+    string as one argument (e.g. for cron expressions with commas).
+    """
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+        self.arguments = getattr(module, 'arguments', None)
+        self.optional_arguments = getattr(module, 'optional_arguments', [])
+        self.split_parameters = getattr(module, 'split_parameters', True)
+        self.description = (module.__doc__ or '').strip()
+
+    @property
+    def status(self):
+        status = {'module': self.module.__name__, 'description': self.description}
+        if self.arguments is not None:
+            status['arguments'] = [name for name, type in self.arguments]
+            status['optional_arguments'] = [name for name, type in self.optional_arguments]
+        return status
+
+    def validate(self, parameters):
+        if self.arguments is None: return True
+
+        if not self.split_parameters: values = [parameters]
+        elif parameters == '': values = []
+        else: values = parameters.split(',')
+
+        minimum = len(self.arguments)
+        maximum = minimum + len(self.optional_arguments)
+        if not minimum <= len(values) <= maximum:
+            raise ActionTypeError('action %s needs %s to %s arguments (%s) - got %s: "%s"' % (
+                self.name, minimum, maximum,
+                ', '.join([name for name, type in self.arguments + self.optional_arguments]),
+                len(values), parameters
+            ))
+
+        for (name, type), value in zip(self.arguments + self.optional_arguments, values):
+            try: type(value)
+            except ValueError:
+                raise ActionTypeError('action %s: argument %s has to be %s - got "%s"' % (
+                    self.name, name, type.__name__, value
+                ))
+        return True
+
+    def create(self, parameters):
+        self.validate(parameters)
+        action_object = self.module.get(parameters)
+        if action_object is None:
+            raise ActionTypeError('action %s could not be created with parameters "%s"' % (self.name, parameters))
+        return action_object
+
+class ActionRegistry(object):
+
+    __action_types = {}
+    @property
+    def action_types(self): return self.__action_types
+
+    @property
+    def status(self):
+        status = {}
+        for name in self.__action_types:
+            status[name] = self.__action_types[name].status
+        return status
+
+    def __init__(self):
+        self.__action_types = {}
+
+    def register_action_type(self, name, module):
+        if not hasattr(module, 'get'):
+            logger.debug('%s has no function get - no action type', module.__name__)
+            return False
+        if name in self.__action_types:
+            logger.warning('action type %s from %s replaces %s', name, module.__name__,
+                           self.__action_types[name].module.__name__)
+        self.__action_types[name] = ActionType(name, module)
+        logger.trace('registered action type %s from %s', name, module.__name__)
+        return True
+
+    def discover_modules(self):
+        for module_loader, name, is_package in pkgutil.iter_modules(action.SingleActions.__path__):
+            try: module = importlib.import_module('action.SingleActions.'+name)
+            except Exception as ex:
+                logger.warning('could not load action type %s: %s', name, ex)
+                continue
+            self.register_action_type(name, module)
+
+    def discover_entry_points(self):
+        try: import pkg_resources
+        except ImportError:
+            logger.debug('pkg_resources not available - skip third-party actions')
+            return
+        for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP):
+            try: module = entry_point.load()
+            except Exception:
+                logger.exception('could not load action type %s from entry point', entry_point.name)
+                continue
+            self.register_action_type(entry_point.name, module)
+
+    def get(self, name):
+        return self.__action_types.get(name)
+
+    def create_action(self, config_string):
+        name, separator, parameters = config_string.partition(':')
+        action_type = self.__action_types.get(name)
+        if action_type is None:
+            raise ActionTypeError('action type %s is unknown - possible values are %s' % (
+                name, sorted(self.__action_types.keys())
+            ))
+        return action_type.create(parameters)
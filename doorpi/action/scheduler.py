@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import heapq
+import itertools
+import os # used by: Scheduler.__init__ (wakeup pipe)
+import select # used by: Scheduler.run
+import time
+
+from action.cron import CronExpression
+
+# upper limit for one sleep - catches jumps of the system clock (e.g. NTP after boot)
+MAX_SLEEP = 60
+
+class ScheduledJob(object):
+
+    def __init__(self, timestamp, callback, args = (), name = None, next_timestamp = None):
+        self.timestamp = timestamp
+        self.callback = callback
+        self.args = args
+        self.name = name or str(callback)
+        # callable(last_timestamp) -> next timestamp or None for single jobs
+        self.next_timestamp = next_timestamp
+        self.cancelled = False
+
+    def __str__(self):
+        return "%s at %s" % (self.name, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp)))
+
+class Scheduler(object):
+    """ one thread for all timed jobs
+
+    Jobs are kept in a heap ordered by their timestamp and the thread sleeps
+    until the next one is due. Callbacks run inside the scheduler thread and
+    should return quickly - fire an event asynchronous for anything longer.
+    """
+
+    @property
+    def jobs(self):
+        with self.__lock:
+            return [str(job) for timestamp, counter, job in sorted(self.__heap) if not job.cancelled]
+
+    def __init__(self):
+        logger.debug("__init__")
+        self.__heap = []
+        self.__counter = itertools.count()
+        self.__lock = threading.Lock()
+        self.__destroy = False
+        self.__wakeup_read, self.__wakeup_write = os.pipe()
+        self.__thread = threading.Thread(target = self.run, name = 'Scheduler')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def destroy(self):
+        logger.debug("destroy")
+        with self.__lock:
+            if self.__destroy: return
+            self.__destroy = True
+        self.wakeup(True)
+        self.__thread.join(2)
+        if self.__thread.is_alive():
+            # a callback still runs - the thread may still select on the pipe, leave it open
+            logger.warning('scheduler thread did not end - jobs are not run any more')
+            return
+        with self.__lock:
+            os.close(self.__wakeup_read)
+            os.close(self.__wakeup_write)
+
+    def wakeup(self, destroy = False):
+        # under the lock - the pipe is closed by destroy and its fd numbers may be used by other files then
+        with self.__lock:
+            if self.__destroy and not destroy: return
+            try: os.write(self.__wakeup_write, 'x')
+            except OSError: pass
+
+    def add_job(self, timestamp, callback, args = (), name = None, next_timestamp = None):
+        """ returns the new job - None when the scheduler is already destroyed """
+        job = ScheduledJob(timestamp, callback, args, name, next_timestamp)
+        if not self.push_job(job):
+            logger.debug("scheduler is destroyed - job %s not added", job)
+            return None
+        logger.trace("added job %s", job)
+        return job
+
+    def add_job_in(self, seconds, callback, args = (), name = None, next_timestamp = None):
+        return self.add_job(time.time() + seconds, callback, args, name, next_timestamp)
+
+    def add_cron_job(self, cron_expression, callback, args = (), name = None):
+        if not isinstance(cron_expression, CronExpression):
+            cron_expression = CronExpression(cron_expression)
+        # after a clock jump or a long block continue from now instead of catching up
+        next_timestamp = lambda last_timestamp: cron_expression.next_fire(max(last_timestamp, time.time()))
+        timestamp = next_timestamp(time.time())
+        if timestamp is None:
+            logger.warning("cron expression %s will never fire - job %s not added", cron_expression, name)
+            return None
+        return self.add_job(timestamp, callback, args, name or str(cron_expression), next_timestamp)
+
+    def push_job(self, job):
+        with self.__lock:
+            if self.__destroy: return False
+            heapq.heappush(self.__heap, (job.timestamp, next(self.__counter), job))
+            is_next_job = self.__heap[0][2] is job
+        if is_next_job: self.wakeup()
+        return True
+
+    def cancel_job(self, job):
+        if job is None: return False
+        # job stays in the heap until it is due and will be skipped then
+        job.cancelled = True
+        return True
+
+    def run(self):
+        while not self.__destroy:
+            with self.__lock:
+                while self.__heap and self.__heap[0][2].cancelled:
+                    heapq.heappop(self.__heap)
+                if self.__heap: timeout = min(self.__heap[0][0] - time.time(), MAX_SLEEP)
+                else: timeout = None
+
+            if timeout is None or timeout > 0:
+                if select.select([self.__wakeup_read], [], [], timeout)[0]:
+                    os.read(self.__wakeup_read, 512)
+                continue
+
+            with self.__lock:
+                job = heapq.heappop(self.__heap)[2]
+            if job.cancelled: continue
+
+            try: job.callback(*job.args)
+            except: logger.exception("error while running job %s", job)
+
+            if job.next_timestamp is None or job.cancelled: continue
+            try: job.timestamp = job.next_timestamp(job.timestamp)
+            except:
+                logger.exception("error while calculating next timestamp for job %s", job.name)
+                job.timestamp = None
+            if job.timestamp is not None: self.push_job(job)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+import datetime
+
+from action.event_patterns import is_pattern
+
+# from fine to coarse - the finest granularity with actions sets the tick
+GRANULARITIES = ['Second', 'Minute', 'Hour', 'Day', 'Week', 'Month', 'Year']
+SUFFIXES = ['', 'EvenNumber', 'UnevenNumber']
+
+def next_boundary(granularity, timestamp):
+    dt = datetime.datetime.fromtimestamp(timestamp).replace(microsecond = 0)
+    if granularity == 'Second':
+        dt += datetime.timedelta(seconds = 1)
+    elif granularity == 'Minute':
+        dt = dt.replace(second = 0) + datetime.timedelta(minutes = 1)
+    elif granularity == 'Hour':
+        dt = dt.replace(minute = 0, second = 0) + datetime.timedelta(hours = 1)
+    elif granularity == 'Day':
+        dt = dt.replace(hour = 0, minute = 0, second = 0) + datetime.timedelta(days = 1)
+    elif granularity == 'Week':
+        dt = dt.replace(hour = 0, minute = 0, second = 0) + datetime.timedelta(days = 7 - dt.weekday())
+    elif granularity == 'Month':
+        if dt.month == 12: dt = datetime.datetime(dt.year + 1, 1, 1)
+        else: dt = datetime.datetime(dt.year, dt.month + 1, 1)
+    elif granularity == 'Year':
+        dt = datetime.datetime(dt.year + 1, 1, 1)
+    else:
+        raise Exception('granularity {0} is unknown - possible values are {1}'.format(granularity, GRANULARITIES))
+    # mktime works with local time, so day and above respect daylight saving time
+    return time.mktime(dt.timetuple())
+
+def value_of(granularity, dt):
+    if granularity == 'Week': return dt.isocalendar()[1]
+    return getattr(dt, granularity.lower())
+
+class TimeEvents(object):
+    """ fires OnTimeSecond, OnTimeMinute, ... aligned to the wall clock
+
+    Only granularities with registered actions are calculated and fired.
+    Without any time based actions no job is scheduled at all.
+    """
+
+    @property
+    def granularities(self):
+        return [granularity for granularity in GRANULARITIES
+                if self.__event_handler.has_actions_for_any(
+                    ['OnTime' + granularity + suffix for suffix in SUFFIXES]
+                )]
+
+    __job = None
+    @property
+    def job(self): return self.__job
+
+    def __init__(self, event_handler, scheduler):
+        logger.debug("__init__")
+        self.__event_handler = event_handler
+        self.__scheduler = scheduler
+        self.__lock = threading.RLock()
+        self.__last_tick = None
+        self.__started = False
+
+        event_handler.register_event('~OnTime*', __name__)
+        event_handler.register_action_listener(self.action_registered)
+
+    def destroy(self):
+        logger.debug("destroy")
+        with self.__lock:
+            self.__started = False
+            self.__scheduler.cancel_job(self.__job)
+            self.__job = None
+        self.__event_handler.unregister_source(__name__, True)
+
+    def start(self):
+        with self.__lock:
+            self.__started = True
+            self.refresh()
+
+    def action_registered(self, event_name):
+        if event_name.startswith('OnTime') or is_pattern(event_name): self.refresh()
+
+    def refresh(self):
+        with self.__lock:
+            if not self.__started: return
+            self.__scheduler.cancel_job(self.__job)
+            self.__job = None
+
+            next_tick = self.next_tick(time.time())
+            if next_tick is None:
+                logger.debug('no actions for time based events - no tick needed')
+                return
+            logger.debug('time based events needed for %s', self.granularities)
+            self.__job = self.__scheduler.add_job(
+                timestamp = next_tick,
+                callback = self.tick,
+                name = 'time based events',
+                next_timestamp = self.next_tick
+            )
+
+    def next_tick(self, timestamp):
+        granularities = self.granularities
+        if not granularities: return None
+        # never schedule into the past - after a clock jump or a long block skip missed ticks
+        return next_boundary(granularities[0], max(timestamp, time.time()))
+
+    def tick(self):
+        with self.__lock:
+            if self.__job is None: return
+            timestamp = self.__job.timestamp
+        last_tick = self.__last_tick or timestamp - 1
+        self.__last_tick = timestamp
+        dt = datetime.datetime.fromtimestamp(timestamp)
+
+        for granularity in reversed(self.granularities):
+            if next_boundary(granularity, last_tick) > timestamp: continue
+            event_name = 'OnTime' + granularity
+            if value_of(granularity, dt) % 2 is 0: number_event_name = event_name + 'EvenNumber'
+            else: number_event_name = event_name + 'UnevenNumber'
+            for name in [event_name, number_event_name]:
+                if self.__event_handler.has_actions(name):
+                    self.__event_handler.fire_event_asynchron(name, __name__)
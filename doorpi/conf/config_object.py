@@ -7,7 +7,25 @@ logger.debug("%s loaded", __name__)
 
 import ConfigParser
 
+from conf.config_schema import SCHEMA
+
+BOOLEAN_TRUE = ['true', 'yes', 'ja', '1']
+
+def to_boolean(value): return value.lower() in BOOLEAN_TRUE
+def to_list(value): return [item.strip() for item in value.split(',') if item.strip()]
+
+PARSERS = {str: str, int: int, float: float, bool: to_boolean, list: to_list}
+
+class ConfigValueError(Exception): pass
+
 class ConfigObject():
+    """ the values of one configfile - never changed after loading
+
+    Keys of the SCHEMA are parsed to their type when the config is loaded,
+    so a wrong value stops DoorPi at startup and not at the first call.
+    Every other typed value is parsed at its first access and kept.
+    A new config (reload) is a new ConfigObject.
+    """
 
     __sections = {}
     @property
@@ -15,7 +33,10 @@ class ConfigObject():
 
     def __init__(self, config):
         logger.debug("__init__")
+        self.__sections = {}
+        self.__typed = {} # (section, key, type) -> value
         self.get_from_config(config)
+        self.validate()
 
     def __del__(self):
         return self.destroy()
@@ -33,39 +54,49 @@ class ConfigObject():
         config.read(configfile.name)
         if not config.sections():
             configfile.close()
-            raise Exception("No valid configfile found at "+configfile)
+            raise Exception("No valid configfile found at "+configfile.name)
         return ConfigObject(config)
 
+    def validate(self):
+        errors = []
+        for section in SCHEMA:
+            for key, value_type in SCHEMA[section].items():
+                value = self.__sections.get(section, {}).get(key)
+                if value is None: continue
+                # empty numbers mean the default of the getter - as in get_typed
+                if not value and value_type in (int, float): continue
+                try: self.__typed[(section, key, value_type)] = PARSERS[value_type](value)
+                except ValueError:
+                    errors.append("key '%s' in section '%s' has to be %s - got '%s'" % (key, section, value_type.__name__, value))
+        if errors: raise ConfigValueError('invalid configfile: ' + ', '.join(errors))
+
+    def get_typed(self, section, key, value_type, default):
+        # hot path - no logging here
+        try: return self.__typed[(section, key, value_type)]
+        except KeyError: pass
+        value = self.__sections.get(section, {}).get(key)
+        if value is None: return default
+        if not value and value_type in (int, float): return default
+        value = self.__typed[(section, key, value_type)] = PARSERS[value_type](value)
+        return value
+
     def get_boolean(self, section, key, default = False):
-        value = self.get(section, key, str(default))
-        return value.lower() in ['true', 'yes', 'ja', '1']
+        return self.get_typed(section, key, bool, default)
 
     def get(self, section, key, default = ''):
-        logger.trace("get for key %s in section %s (default: %s)", key, section, default)
         return self.get_string(section, key, default)
 
     def get_string(self, section, key, default = ''):
-        logger.trace("get_string for key %s in section %s (default: %s)", key, section, default)
-        if section in self.__sections:
-            if key in self.__sections[section]:
-                if key is 'password':
-                    logger.trace("key '%s' exist in section '%s' with value '%s'", key, section, '*******')
-                else:
-                    logger.trace("key '%s' exist in section '%s' with value '%s'", key, section, self.__sections[section][key])
-                return self.__sections[section][key]
-            else:
-                logger.trace("key '%s' doesn't exist in section '%s' ", key, section)
-        else:
-            logger.trace("section '%s' doesn't exist", section)
-
-        logger.trace("return default '%s", default)
-        return default
+        return self.__sections.get(section, {}).get(key, default)
 
     def get_int(self, section, key, default = -1):
-        logger.trace("get_int for key %s in section %s (default: %s)", key, section, default)
-        value = self.get_string(section, key)
-        if value is not '': return int(value)
-        else: return default
+        return self.get_typed(section, key, int, default)
+
+    def get_float(self, section, key, default = 0.0):
+        return self.get_typed(section, key, float, default)
+
+    def get_list(self, section, key, default = None):
+        return self.get_typed(section, key, list, default if default is not None else [])
 
     def get_sections(self, filter = ''):
         logger.trace("get_sections")
@@ -88,4 +119,4 @@ class ConfigObject():
             self.__sections[section] = {}
             for key, value in config.items(section):
                 if key.startswith(';') or key.startswith('#'): continue
-                self.__sections[section][str(key)] = str(value)
\ No newline at end of file
+                self.__sections[section][str(key)] = str(value)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+# types of the known keys - parsed and checked once when the config is loaded
+# (str keys are not listed, the defaults stay with the code that reads the key)
+SCHEMA = {
+    'DoorPi': {
+        'record_while_dialing': bool
+    },
+    'keyboard': {
+        'bouncetime': int,
+        'debounce': int,
+        'long_press': int,
+        'double_press': int,
+        'input_buffer': int,
+        'output_tick': float,
+        'input_ttl': float
+    },
+    'SMTP': {
+        'port': int,
+        'use_tls': bool,
+        'need_login': bool,
+        'timeout': int,
+        'batch_window': int,
+        'retry_interval': int,
+        'retry_max_interval': int,
+        'max_attempts': int,
+        'keep_alive': int
+    },
+    'EventHandler': {
+        'workers': int,
+        'queue_size': int,
+        'history_depth': int,
+        'history_events': int
+    },
+    'Metrics': {
+        'enabled': bool
+    },
+    'Webservice': {
+        'port': int,
+        'workers': int,
+        'timeout': int,
+        'keep_alive': bool,
+        'stream_clients': int,
+        'stream_buffer': int,
+        'stream_heartbeat': int
+    },
+    'Journal': {
+        'enabled': bool,
+        'commit_interval': int,
+        'batch_size': int,
+        'retention_days': int,
+        'exclude': list
+    },
+    'ConfigWatcher': {
+        'enabled': bool,
+        'debounce': float
+    },
+    'Logging': {
+        'max_bytes': int,
+        'backup_count': int,
+        'batch_interval': float
+    }
+}
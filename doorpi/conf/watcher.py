@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import errno
+import struct
+import select # used by: ConfigWatcher.run
+import threading
+import ctypes
+import ctypes.util
+
+import doorpi
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len - followed by len bytes name
+# editors write a temporary file and rename it - so the directory is watched, not the file
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+
+def load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+def load_config_watcher():
+    config = doorpi.DoorPi().config
+    if not config.get_boolean('ConfigWatcher', 'enabled', True): return None
+    libc = load_libc()
+    if libc is None:
+        logger.warning('inotify not available - configfile is not watched (reload with SIGHUP)')
+        return None
+    watcher = ConfigWatcher(
+        libc = libc,
+        filename = doorpi.DoorPi().config_filename,
+        reload_callback = doorpi.DoorPi().reload_config,
+        scheduler = doorpi.DoorPi().scheduler,
+        debounce = config.get_float('ConfigWatcher', 'debounce', 2.0)
+    )
+    if not watcher.start(): return None
+    return watcher
+
+class ConfigWatcher(object):
+    """ reloads the config when the configfile was written
+
+    The thread blocks in select on the inotify descriptor and a wakeup
+    pipe, so an unchanged configfile costs no wakeup at all. Every write
+    only (re)schedules the reload debounce seconds later - an editor
+    that writes the file in several steps causes one reload.
+    """
+
+    @property
+    def filename(self): return self.__filename
+
+    @property
+    def status(self):
+        return {
+            'filename': self.__filename,
+            'debounce': self.__debounce,
+            'changes': self.__changes
+        }
+
+    def __init__(self, libc, filename, reload_callback, scheduler, debounce = 2.0):
+        logger.debug("__init__ (%s)", filename)
+        self.__libc = libc
+        self.__filename = os.path.abspath(filename)
+        self.__reload_callback = reload_callback
+        self.__scheduler = scheduler
+        self.__debounce = debounce
+        self.__changes = 0
+        self.__reload_job = None
+        self.__lock = threading.Lock()
+        self.__destroy = False
+        self.__inotify = None
+        self.__wakeup_read = self.__wakeup_write = None
+        self.__thread = None
+
+    def start(self):
+        self.__inotify = self.__libc.inotify_init1(IN_CLOEXEC)
+        if self.__inotify < 0:
+            logger.warning('inotify_init1 failed (%s) - configfile is not watched', os.strerror(ctypes.get_errno()))
+            return False
+        directory = os.path.dirname(self.__filename)
+        if self.__libc.inotify_add_watch(self.__inotify, directory, WATCH_MASK) < 0:
+            logger.warning('could not watch %s (%s) - configfile is not watched', directory, os.strerror(ctypes.get_errno()))
+            os.close(self.__inotify)
+            return False
+
+        self.__wakeup_read, self.__wakeup_write = os.pipe()
+        self.__thread = threading.Thread(target = self.run, name = 'config watcher')
+        self.__thread.daemon = True
+        self.__thread.start()
+        logger.info('watching configfile %s', self.__filename)
+        return True
+
+    def destroy(self):
+        logger.debug("destroy")
+        with self.__lock:
+            self.__destroy = True
+            self.__scheduler.cancel_job(self.__reload_job)
+            self.__reload_job = None
+        if self.__thread is None: return
+        try: os.write(self.__wakeup_write, 'x')
+        except OSError: pass
+        self.__thread.join(2)
+        self.__thread = None
+
+    def run(self):
+        directory, basename = os.path.split(self.__filename)
+        while not self.__destroy:
+            try:
+                readable = select.select([self.__inotify, self.__wakeup_read], [], [])[0]
+                if self.__inotify not in readable: continue
+                data = os.read(self.__inotify, 4096)
+            except (select.error, OSError) as ex:
+                if ex.args[0] == errno.EINTR: continue
+                logger.exception('error while reading inotify events')
+                break
+
+            changed = False
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip('\0')
+                offset += EVENT_HEADER.size + length
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    logger.warning('directory %s of the configfile is gone - stop watching', directory)
+                    self.__destroy = True
+                elif name == basename: changed = True
+            if changed: self.changed()
+
+        os.close(self.__inotify)
+        os.close(self.__wakeup_read)
+        os.close(self.__wakeup_write)
+
+    def changed(self):
+        with self.__lock:
+            if self.__destroy: return
+            self.__changes += 1
+            self.__scheduler.cancel_job(self.__reload_job)
+            self.__reload_job = self.__scheduler.add_job_in(self.__debounce, self.reload, name = 'config reload')
+        logger.trace('configfile %s changed - reload in %s seconds', self.__filename, self.__debounce)
+
+    def reload(self):
+        with self.__lock:
+            self.__reload_job = None
+            if self.__destroy: return
+        if not os.path.isfile(self.__filename):
+            # renamed away - the new file is announced by IN_MOVED_TO or IN_CREATE
+            logger.debug('configfile %s does not exist right now - skip reload', self.__filename)
+            return
+        try: self.__reload_callback(self.__filename)
+        except Exception as ex: logger.error('reload of changed configfile failed - keep the old one: %s', ex)
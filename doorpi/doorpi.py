@@ -11,18 +11,44 @@ import argparse
 import time # used by: DoorPi.run
 import os # used by: DoorPi.load_config
 
-import datetime # used by: parse_string
-import cgi # used by: parse_string
+import datetime # used by: history_as_html
+import cgi # used by: infos_as_html, history_as_html
 import threading
-import BaseHTTPServer
+import signal # used by: DoorPi.run
+import collections # used by: DoorPi.config_actions
 
 import metadata
 from keyboard.KeyboardInterface import load_keyboard
 from conf.config_object import ConfigObject
+from conf.watcher import load_config_watcher
 from action.handler import EventHandler
+from action.dispatcher import load_dispatcher
+from action.scheduler import Scheduler
+from action.time_events import TimeEvents
+from action.registry import load_action_registry
+from action.history import load_event_history
 from status.status_class import DoorPiStatus
-from status.webservice import run_webservice, WebService
+from status.metrics import metrics
+from status.webservice import load_webservice
+from status.event_stream import load_event_stream
+from status.journal import load_journal
+from mail.outbox import load_mail_outbox
+from template.compiler import compile_template
+from log.pipeline import configure_logging
 from action.base import SingleAction
+from action.SingleActions.schedule import unschedule_all_except # used by: DoorPi.reload_config_locked
+
+# sections that reload_config takes over without restart - EVENT_* too
+RELOADED_SECTIONS = ['DTMF', 'SCHEDULE', 'AdminNumbers', 'Logging', 'LogLevels', 'Metrics']
+# keys of other sections that reload_config takes over
+RELOADED_KEYS = {'DoorPi': ['is_alive_led']}
+
+def without_reloaded_keys(section, config):
+    # actions of known input pins are reloaded - a new or removed pin needs the keyboard set up again
+    if section == 'InputPins': return sorted(config.all.get(section, {}))
+    values = dict(config.all.get(section, {}))
+    for key in RELOADED_KEYS.get(section, []): values.pop(key, None)
+    return values
 
 class Singleton(type):
     _instances = {}
@@ -40,6 +66,12 @@ class DoorPi(object):
     @property
     def config(self): return self.__config
 
+    __config_filename = None
+    @property
+    def config_filename(self): return self.__config_filename
+
+    __config_actions = {} # event_name -> (action strings, action objects) registered from the configfile
+
     __keyboard = None
     @property
     def keyboard(self): return self.__keyboard
@@ -58,12 +90,43 @@ class DoorPi(object):
     @property
     def event_handler(self): return self.__event_handler
 
+    __action_registry = None
+    @property
+    def action_registry(self): return self.__action_registry
+
+    __scheduler = None
+    @property
+    def scheduler(self): return self.__scheduler
+
+    __time_events = None
+    @property
+    def time_events(self): return self.__time_events
+
+    __mail_outbox = None
+    @property
+    def mail_outbox(self): return self.__mail_outbox
+
+    __journal = None
+    @property
+    def journal(self): return self.__journal
+
+    __event_stream = None
+    @property
+    def event_stream(self): return self.__event_stream
+
+    __config_watcher = None
+    @property
+    def config_watcher(self): return self.__config_watcher
+
     __webserver = None
     @property
     def webserver(self): return self.__webserver
 
+    __status = None
     @property
-    def status(self): return DoorPiStatus(self)
+    def status(self):
+        if self.__status is None: self.__status = DoorPiStatus(self)
+        return self.__status
 
     @property
     def base_path(self): return os.path.dirname(__file__)
@@ -85,6 +148,7 @@ class DoorPi(object):
         self.stderr_path = '/var/log/doorpi/stderr.log'
         self.pidfile_path =  '/var/run/doorpi.pid'
         self.pidfile_timeout = 5
+        self.__reload_lock = threading.Lock()
 
     def prepare(self, parsed_arguments):
         logger.debug("prepare")
@@ -96,6 +160,19 @@ class DoorPi(object):
         self.__event_handler = EventHandler()
 
         self.__config = ConfigObject.load_config(parsed_arguments.configfile)
+        self.__config_filename = parsed_arguments.configfile.name
+        self.event_handler.set_dispatcher(load_dispatcher())
+        self.event_handler.set_history(load_event_history())
+        metrics.configure(self.config)
+        self.__action_registry = load_action_registry()
+        # after the registry - all modules are loaded and their loggers known
+        configure_logging(self.config)
+        self.__scheduler = Scheduler()
+        self.__time_events = TimeEvents(self.event_handler, self.scheduler)
+        self.__event_stream = load_event_stream()
+        self.__journal = load_journal()
+        self.__mail_outbox = load_mail_outbox()
+        self.mail_outbox.start()
         self.__keyboard = load_keyboard()
         logger.debug('Keyboard is now %s', self.keyboard.name)
         self.__sipphone = self.detect_sipphone()
@@ -104,28 +181,16 @@ class DoorPi(object):
         #register own events
         self.event_handler.register_event('OnStartup', __name__)
         self.event_handler.register_event('OnShutdown', __name__)
+        self.event_handler.register_event('OnConfigReload', __name__)
 
-        # register eventbased actions from configfile
-        for event_section in self.config.get_sections('EVENT_'):
-            event_name = event_section[len('EVENT_'):]
-            for action in sorted(self.config.get_keys(event_section)):
-                self.event_handler.register_action(event_name, self.config.get(event_section, action))
-
-        # register actions for inputpins
-        section_name = 'InputPins'
-        for input_pin in sorted(self.config.get_keys(section_name)):
-            self.event_handler.register_action('OnKeyPressed_'+input_pin, self.config.get(section_name, input_pin))
+        # register actions from configfile - reload_config only changes these
+        self.__config_actions = {}
+        config_actions, schedule_actions = self.config_actions(self.config)
+        for event_name, action_strings in config_actions.items():
+            self.register_config_actions(event_name, action_strings)
+        for schedule_action in schedule_actions: schedule_action.run()
 
-        # register actions for DTMF
-        section_name = 'DTMF'
-        for DTMF in sorted(self.config.get_keys(section_name)):
-            self.event_handler.register_action('OnDTMF_'+DTMF, self.config.get(section_name, DTMF))
-
-        # register keep_alive_led
-        is_alive_led = self.config.get('DoorPi', 'is_alive_led', None)
-        if is_alive_led is not None:
-            self.event_handler.register_action('OnTimeSecondEvenNumber', 'out:%s,HIGH,False'%is_alive_led)
-            self.event_handler.register_action('OnTimeSecondUnevenNumber', 'out:%s,LOW,False'%is_alive_led)
+        self.start_alive_led(self.config)
 
         self.__prepared = True
         return self
@@ -136,6 +201,22 @@ class DoorPi(object):
     def destroy(self):
         logger.debug("destroy")
         self.__shutdown = True
+        if self.config_watcher is not None:
+            self.config_watcher.destroy()
+            self.__config_watcher = None
+
+        if self.event_stream is not None:
+            self.event_stream.destroy()
+            self.__event_stream = None
+
+        if self.webserver is not None:
+            self.webserver.destroy()
+            self.__webserver = None
+
+        if self.time_events is not None:
+            self.time_events.destroy()
+            self.__time_events = None
+
         if self.event_handler is not None:
             self.event_handler.fire_event_synchron('OnShutdown', __name__)
             self.event_handler.unregister_source(__name__, True)
@@ -155,6 +236,20 @@ class DoorPi(object):
             if timeout <= 0:
                 logger.error("waiting for theards timed out - there are still theards: %s", self.event_handler.threads[1:])
 
+        # after OnShutdown and its actions - output writes and pulses they scheduled still run or end at once
+        if self.scheduler is not None:
+            self.scheduler.destroy()
+            self.__scheduler = None
+
+        # after OnShutdown and its actions - pending journal entries are written, mails that are due now are still sent
+        if self.journal is not None:
+            self.journal.destroy()
+            self.__journal = None
+
+        if self.mail_outbox is not None:
+            self.mail_outbox.destroy()
+            self.__mail_outbox = None
+
         if self.keyboard is not None:
             self.keyboard.destroy()
             self.__keyboard = None
@@ -169,29 +264,144 @@ class DoorPi(object):
             self.__event_handler = None
             del self.__event_handler
 
+        self.__status = None
+
     def run(self):
         logger.debug("run")
         if not self.__prepared: self.prepare(self.__parsed_arguments)
 
         self.event_handler.fire_event_synchron('OnStartup', __name__)
 
-        self.event_handler.register_event('OnTimeSecond', __name__)
-        self.event_handler.register_action('OnTimeSecond', 'sleep:1')
-        self.event_handler.register_action('OnTimeSecond', 'time_tick:second')
-        self.event_handler.fire_event_asynchron('OnTimeSecond', __name__)
+        self.time_events.start()
+
+        self.__webserver = load_webservice()
+        self.webserver.start()
 
-        #self.event_handler.register_event('StartWebserverDaemon', __name__)
-        #self.event_handler.register_action('StartWebserverDaemon', SingleAction(run_webservice))
-        #self.event_handler.fire_event_asynchron_daemon('StartWebserverDaemon', __name__)
+        signal.signal(signal.SIGHUP, self.reload_signal)
+        self.__config_watcher = load_config_watcher()
 
         logger.info('DoorPi started successfully')
-        server_address = ('', 8080)
-        httpd = BaseHTTPServer.HTTPServer(server_address, WebService)
-        try: httpd.serve_forever()
-        except: httpd.socket.close()
+        # everything runs in own threads - the main thread only waits for signals (Ctrl-C, SIGTERM, SIGHUP)
+        while not self.shutdown: signal.pause()
 
         return self
 
+    def config_actions(self, config):
+        """ event_name -> action strings in order of registration and the schedule actions of the SCHEDULE section """
+        config_actions = collections.OrderedDict()
+        add = lambda event_name, action_string: config_actions.setdefault(event_name, []).append(action_string)
+
+        for event_section in config.get_sections('EVENT_'):
+            for action in sorted(config.get_keys(event_section)):
+                add(event_section[len('EVENT_'):], config.get(event_section, action))
+
+        for input_pin in sorted(config.get_keys('InputPins')):
+            add('OnKeyPressed_'+input_pin, config.get('InputPins', input_pin))
+
+        for DTMF in sorted(config.get_keys('DTMF')):
+            add('OnDTMF_'+DTMF, config.get('DTMF', DTMF))
+
+        # key is a cron expression
+        schedule_actions = []
+        for cron_expression in sorted(config.get_keys('SCHEDULE')):
+            schedule_action = SingleAction.from_string('schedule:'+cron_expression)
+            add(schedule_action.event_name, config.get('SCHEDULE', cron_expression))
+            schedule_actions.append(schedule_action)
+
+        return config_actions, schedule_actions
+
+    def start_alive_led(self, config, old_config = None):
+        # blinks by a job of the scheduler - no events every second
+        if self.keyboard is None: return
+        if old_config is not None:
+            old_alive_led = old_config.get('DoorPi', 'is_alive_led', None)
+            if old_alive_led is not None: self.keyboard.stop_pattern(old_alive_led, 0)
+        is_alive_led = config.get('DoorPi', 'is_alive_led', None)
+        if is_alive_led is not None: self.keyboard.blink(is_alive_led, 1000, 1000)
+
+    def register_config_actions(self, event_name, action_strings, action_objects = None):
+        registered = []
+        for index, action_string in enumerate(action_strings):
+            action_object = self.event_handler.register_action(
+                event_name,
+                action_objects[index] if action_objects is not None else action_string
+            )
+            if action_object: registered.append(action_object)
+        self.__config_actions[event_name] = (action_strings, registered)
+
+    def unregister_config_actions(self, event_name):
+        action_strings, action_objects = self.__config_actions.pop(event_name, ([], []))
+        for action_object in action_objects:
+            self.event_handler.unregister_action(event_name, action_object)
+
+    def reload_config(self, configfile = None):
+        """ reads the configfile again and only registers the actions of changed events again
+
+        SIP registration, keyboard and GPIO setup are kept - changes of
+        their sections are only logged and need a restart. A configfile
+        with errors raises an exception and the old config stays active.
+        OnConfigReload is fired with the result or the error.
+        """
+        configfile = configfile or self.config_filename
+        with self.__reload_lock:
+            try: result = self.reload_config_locked(configfile)
+            except Exception as ex:
+                self.event_handler.fire_event_asynchron('OnConfigReload', __name__, {'configfile': configfile, 'error': str(ex)})
+                raise
+        self.event_handler.fire_event_asynchron('OnConfigReload', __name__, result)
+        return result
+
+    def reload_config_locked(self, configfile):
+        start = time.time()
+        logger.info('reload config from %s', configfile)
+        with open(configfile) as config_file:
+            config = ConfigObject.load_config(config_file)
+
+        config_actions, schedule_actions = self.config_actions(config)
+        changed_events = [event_name for event_name in set(self.__config_actions) | set(config_actions)
+                          if self.__config_actions.get(event_name, ([], []))[0] != config_actions.get(event_name, [])]
+
+        # create all new actions first - an invalid action raises ActionTypeError and keeps the old config
+        action_objects = {}
+        for event_name in changed_events:
+            action_objects[event_name] = [SingleAction.from_string(action_string) for action_string in config_actions.get(event_name, [])]
+
+        old_config = self.config
+        self.__config = config
+        self.__config_filename = configfile
+
+        for event_name in changed_events:
+            self.unregister_config_actions(event_name)
+            if event_name in config_actions:
+                self.register_config_actions(event_name, config_actions[event_name], action_objects[event_name])
+        # already scheduled cron expressions are skipped
+        unschedule_all_except([schedule_action.event_name for schedule_action in schedule_actions])
+        for schedule_action in schedule_actions: schedule_action.run()
+        if old_config.get('DoorPi', 'is_alive_led', None) != config.get('DoorPi', 'is_alive_led', None):
+            self.start_alive_led(config, old_config)
+
+        metrics.configure(config)
+        configure_logging(config)
+        self.status.invalidate_static()
+
+        restart_sections = sorted(section for section in set(old_config.all) | set(config.all)
+                                  if not section.startswith('EVENT_') and section not in RELOADED_SECTIONS
+                                  and without_reloaded_keys(section, old_config) != without_reloaded_keys(section, config))
+        if restart_sections:
+            logger.warning('changes in sections %s need a restart of DoorPi', ', '.join(restart_sections))
+        duration = time.time() - start
+        logger.info('config reloaded in %.3f seconds - actions of %s events changed', duration, len(changed_events))
+        return {
+            'configfile': configfile,
+            'changed_events': sorted(changed_events),
+            'restart_needed': restart_sections,
+            'duration': duration
+        }
+
+    def reload_signal(self, signum, frame):
+        try: self.reload_config()
+        except Exception as ex: logger.error('reload of config failed - keep the old one: %s', ex)
+
     #TODO: wie keyboard auslagern!
     def detect_sipphone(self):
         # find installed keyboards by import of libraries
@@ -206,41 +416,51 @@ class DoorPi(object):
             return sipphone.by_pjsua.Pjsua()
 
     def parse_string(self, input_string):
-        parsed_string = datetime.datetime.now().strftime(input_string)
-
-        if self.keyboard is None or self.keyboard.last_key is None:
-            self.additional_informations['LastKey'] = "NotSetYet"
-        else:
-            self.additional_informations['LastKey'] = str(self.keyboard.last_key)
-
-        parsed_string = parsed_string.replace(
-            "!INFOS_PLAIN!",
-            str(self.additional_informations)
-        )
-
-        infos_as_html = '<table>'
-        for key in self.additional_informations.keys():
-            infos_as_html += '<tr><td>'
-            infos_as_html += '<b>'+key+'</b>'
-            infos_as_html += '</td><td>'
-            infos_as_html += '<i>'+cgi.escape(
-                str(self.additional_informations.get(key)).replace("\r\n", "<br />")
-            )+'</i>'
-            infos_as_html += '</td></tr>'
-        infos_as_html = '</table>'
-
-        parsed_string = parsed_string.replace(
-            "!INFOS!",
-            infos_as_html
-        )
-
-        for key in self.additional_informations.keys():
-            parsed_string = parsed_string.replace(
-                "!"+key+"!",
-                str(self.additional_informations[key])
+        return compile_template(input_string).render(
+            self.event_handler.history if self.event_handler is not None else {},
+            lazy = dict(
+                LastKey = self.last_key,
+                INFOS_PLAIN = self.infos_as_plain,
+                INFOS = self.infos_as_html,
+                HISTORY = self.history_as_html
             )
+        )
 
-        return parsed_string
+    def last_key(self):
+        if self.keyboard is None or self.keyboard.last_key is None: return "NotSetYet"
+        return str(self.keyboard.last_key)
+
+    def infos(self):
+        infos = self.additional_informations
+        infos['LastKey'] = self.last_key()
+        return infos
+
+    def infos_as_plain(self):
+        return str(self.infos())
+
+    def infos_as_html(self):
+        infos = self.infos()
+        infos_as_html = ['<table>']
+        for key in infos.keys():
+            infos_as_html.append('<tr><td><b>%s</b></td><td><i>%s</i></td></tr>' % (
+                key,
+                cgi.escape(str(infos.get(key))).replace("\r\n", "<br />")
+            ))
+        infos_as_html.append('</table>')
+        return ''.join(infos_as_html)
+
+    def history_as_html(self):
+        if self.event_handler is None: return ''
+        history_as_html = ['<table>']
+        for record in self.event_handler.history.recent(self.event_handler.history.depth):
+            history_as_html.append('<tr><td>%s</td><td><b>%s</b></td><td>%s</td><td><i>%s</i></td></tr>' % (
+                datetime.datetime.fromtimestamp(record.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+                cgi.escape(record.event_name),
+                cgi.escape(str(record.source)),
+                cgi.escape(str(record.kwargs or ''))
+            ))
+        history_as_html.append('</table>')
+        return ''.join(history_as_html)
 
 if __name__ == '__main__':
     raise Exception('use main.py to start DoorPi')
\ No newline at end of file
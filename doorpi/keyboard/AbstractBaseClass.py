@@ -5,6 +5,12 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
+import time # used by: input_mask
+import threading
+
+from keyboard.patterns import OutputPattern, blink_sequence
+import doorpi
+
 class KeyboardAbstractBaseClass(object):
     __InputPins = []
     __OutputPins = []
@@ -18,12 +24,117 @@ class KeyboardAbstractBaseClass(object):
     #def get_last_key(self): raise NotImplementedError("Subclasses should implement this!")
     @property
     def last_key(self): return self.get_last_key()
-    #def is_key_pressed(self): raise NotImplementedError("Subclasses should implement this!")
+
+    # seconds a read of the input port is used again - keyboards set it from [keyboard] input_ttl
+    input_ttl = 0.02
+    # (timestamp, bitmask) of the last read of the input port
+    __input_read = (0, 0)
+
+    def read_input_port(self): raise NotImplementedError("Subclasses should implement this!")
+
+    def input_mask(self, max_age = None):
+        """ bit n is set while input pin n is pressed - the hardware is read at most every input_ttl seconds """
+        timestamp, mask = self.__input_read
+        now = time.time()
+        if now - timestamp >= (self.input_ttl if max_age is None else max_age):
+            mask = self.read_input_port()
+            self.__input_read = (now, mask)
+        return mask
+
+    def input_pressed(self, pin, max_age = None):
+        return bool(self.input_mask(max_age) >> int(pin) & 1)
+
+    def read_input(self, pin):
+        # always from the hardware - for the input pipeline after debounce
+        return self.input_pressed(pin, 0)
+
     @property
-    def pressed_key(self): return self.is_key_pressed()
-    #def which_keys_are_pressed(self): raise NotImplementedError("Subclasses should implement this!")
+    def pressed_key(self):
+        mask = self.input_mask()
+        for input_pin in self.input_pins:
+            if mask >> input_pin & 1: return input_pin
+        return None
+
     @property
-    def pressed_keys(self): return self.which_keys_are_pressed()
+    def pressed_keys(self):
+        mask = self.input_mask()
+        return [input_pin for input_pin in self.input_pins if mask >> input_pin & 1]
+
+    # pin -> callbacks, lists are replaced (never changed) so the interrupt thread reads them without lock
+    __edge_callbacks = {}
+    # writers copy and replace under this lock - two concurrent pulses must not lose a callback
+    __edge_callbacks_lock = threading.Lock()
+
+    def register_edge_callback(self, pin, callback):
+        """ callback(pin) at every (debounced) press of pin - runs in the input pipeline and has to return quickly """
+        pin = str(pin)
+        with self.__edge_callbacks_lock:
+            edge_callbacks = dict(self.__edge_callbacks)
+            edge_callbacks[pin] = edge_callbacks.get(pin, []) + [callback]
+            self.__edge_callbacks = edge_callbacks
+
+    def unregister_edge_callback(self, pin, callback):
+        pin = str(pin)
+        with self.__edge_callbacks_lock:
+            callbacks = [other for other in self.__edge_callbacks.get(pin, []) if other != callback]
+            edge_callbacks = dict(self.__edge_callbacks)
+            if callbacks: edge_callbacks[pin] = callbacks
+            else: edge_callbacks.pop(pin, None)
+            self.__edge_callbacks = edge_callbacks
+
+    def notify_edge_callbacks(self, pin):
+        for callback in self.__edge_callbacks.get(str(pin), []):
+            try: callback(pin)
+            except: logger.exception("error while calling edge callback %s for pin %s", callback, pin)
+
+    # pin -> running OutputPattern, replaced under the lock like the edge callbacks
+    __patterns = {}
+    __patterns_lock = threading.Lock()
+    @property
+    def patterns(self): return dict((pin, pattern.status) for pin, pattern in self.__patterns.items())
+
+    def pattern(self, pin, sequence, repeat = True):
+        """ sequence of (value, milliseconds) on an output pin - replaces a running pattern of the pin """
+        pin = int(pin)
+        pattern = OutputPattern(self.set_output, doorpi.DoorPi().scheduler, pin, sequence, repeat, self.pattern_finished)
+        # stop and start under the lock too - of two patterns set at the same time only one may run
+        with self.__patterns_lock:
+            running = self.__patterns.get(pin)
+            if running is not None: running.stop()
+            patterns = dict(self.__patterns)
+            patterns[pin] = pattern
+            self.__patterns = patterns
+            pattern.start()
+        return True
+
+    def blink(self, pin, on_ms, off_ms = None, count = 0):
+        """ count times on_ms on and off_ms off - 0 blinks until stop_pattern """
+        if off_ms is None: off_ms = on_ms
+        if count > 0: return self.pattern(pin, blink_sequence(on_ms, off_ms) * count, repeat = False)
+        return self.pattern(pin, blink_sequence(on_ms, off_ms))
+
+    def stop_pattern(self, pin, value = None):
+        pin = int(pin)
+        with self.__patterns_lock:
+            pattern = self.__patterns.get(pin)
+            if pattern is not None:
+                pattern.stop()
+                patterns = dict(self.__patterns)
+                del patterns[pin]
+                self.__patterns = patterns
+        if value is not None: self.set_output(pin, value, False)
+        return pattern is not None
+
+    def stop_patterns(self):
+        for pin in list(self.__patterns): self.stop_pattern(pin)
+
+    def pattern_finished(self, pattern):
+        with self.__patterns_lock:
+            if self.__patterns.get(pattern.pin) is not pattern: return
+            patterns = dict(self.__patterns)
+            del patterns[pattern.pin]
+            self.__patterns = patterns
+
     def set_output(self, key, start_value = 1, end_value = 0,
                    timeout = 0.5, stop_pin = None, log_output = True
     ): raise NotImplementedError("Subclasses should implement this!")
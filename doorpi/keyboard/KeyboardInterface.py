@@ -19,10 +19,23 @@ def load_keyboard():
         key = 'typ',
         default = 'autodetect'
     )
+    # None - every keyboard has its own default
     bouncetime = doorpi.DoorPi().config.get_int(
         section = 'keyboard',
         key = 'bouncetime',
-        default = 5000
+        default = None
+    )
+    # seconds in which output writes are collected and written together
+    output_tick = doorpi.DoorPi().config.get_float(
+        section = 'keyboard',
+        key = 'output_tick',
+        default = 0.01
+    )
+    # seconds a read of all inputs (pressed_keys, status) is used again
+    input_ttl = doorpi.DoorPi().config.get_float(
+        section = 'keyboard',
+        key = 'input_ttl',
+        default = 0.02
     )
     if config_value not in keyboards.keys():
         raise Exception(
@@ -32,33 +45,40 @@ def load_keyboard():
     return keyboards[config_value](
         input_pins = doorpi.DoorPi().config.get_keys('InputPins'),
         output_pins = doorpi.DoorPi().config.get_keys('OutputPins'),
-        bouncetime = bouncetime
+        bouncetime = bouncetime,
+        output_tick = output_tick,
+        input_ttl = input_ttl
     )
 
 #TODO: Don't repeat yourself -> only one function to load module
-def autodetect(input_pins, output_pins, bouncetime):
+def autodetect(input_pins, output_pins, bouncetime, output_tick, input_ttl):
     logger.trace('autodetect')
-    try: return load_piface(input_pins, output_pins, bouncetime)
+    try: return load_piface(input_pins, output_pins, bouncetime, output_tick, input_ttl)
     except ImportError: logger.info('could not load keyboard piface')
 
-    try: return load_gpio(input_pins, output_pins, bouncetime)
+    try: return load_gpio(input_pins, output_pins, bouncetime, output_tick, input_ttl)
     except ImportError: logger.info('could not load keyboard gpio')
 
     raise Exception('keyboard autodetect failed')
 
-def load_piface(input_pins, output_pins, bouncetime):
+def load_piface(input_pins, output_pins, bouncetime, output_tick, input_ttl):
     logger.trace('load_piface')
     import keyboard.from_piface
     return keyboard.from_piface.PiFace(
         input_pins = input_pins,
-        output_pins = output_pins
+        output_pins = output_pins,
+        bouncetime = bouncetime,
+        output_tick = output_tick,
+        input_ttl = input_ttl
     )
 
-def load_gpio(input_pins, output_pins, bouncetime):
+def load_gpio(input_pins, output_pins, bouncetime, output_tick, input_ttl):
     logger.trace('load_gpio')
     import keyboard.from_gpio
     return keyboard.from_gpio.GPIO(
         input_pins = input_pins,
         output_pins = output_pins,
-        bouncetime = bouncetime
+        bouncetime = bouncetime,
+        output_tick = output_tick,
+        input_ttl = input_ttl
     )
@@ -8,6 +8,8 @@ logger.debug("%s loaded", __name__)
 import RPi.GPIO as RPiGPIO # basic for GPIO control
 
 from keyboard.AbstractBaseClass import KeyboardAbstractBaseClass
+from keyboard.outputs import OutputManager
+from keyboard.inputs import load_input_pipeline
 import doorpi
 
 class GPIO(KeyboardAbstractBaseClass):
@@ -20,38 +22,37 @@ class GPIO(KeyboardAbstractBaseClass):
     @property
     def output_pins(self): return self.__OutputPins
 
-    __OutputStatus = {}
+    __outputs = None
     @property
-    def output_status(self): return self.__OutputStatus
-
-    __last_key = None
+    def outputs(self): return self.__outputs
     @property
+    def output_status(self): return self.__outputs.status
 
-    def last_key(self):
-        return self.__last_key
+    __inputs = None
+    @property
+    def inputs(self): return self.__inputs
+    @property
+    def last_key(self): return self.__inputs.last_key
 
-    def __init__(self, input_pins, output_pins, bouncetime = 5000):
+    def __init__(self, input_pins, output_pins, bouncetime = None, output_tick = 0.01, input_ttl = 0.02):
         logger.debug("GPIO.__init__(input_pins = %s, output_pins = %s)", input_pins, output_pins)
         self.__InputPins = map(int, input_pins)
         self.__OutputPins = map(int, output_pins)
-
-        doorpi.DoorPi().event_handler.register_event('OnKeyPressed', __name__)
+        self.input_ttl = input_ttl
 
         RPiGPIO.setmode(RPiGPIO.BOARD)
 
         RPiGPIO.setup(self.__InputPins, RPiGPIO.IN, pull_up_down = RPiGPIO.PUD_DOWN)
+        # bouncetime is the minimal interval between two presses now - the pipeline debounces
+        if bouncetime is None: bouncetime = 5000
+        self.__inputs = load_input_pipeline(__name__, self.__InputPins, self.read_input, self.notify_edge_callbacks, bouncetime)
         for input_pin in self.__InputPins:
-            RPiGPIO.add_event_detect(
-                input_pin,
-                RPiGPIO.RISING,
-                callback = self.event_detect,
-                bouncetime = bouncetime
-            )
-            doorpi.DoorPi().event_handler.register_event('OnKeyPressed_'+str(input_pin), __name__)
+            # both edges - the pipeline reads the level after debounce anyway
+            RPiGPIO.add_event_detect(input_pin, RPiGPIO.BOTH, callback = self.event_detect)
 
         RPiGPIO.setup(self.__OutputPins, RPiGPIO.OUT)
-        #RPiGPIO.output(self.__OutputPins, RPiGPIO.LOW)
-        # use set_output to register status @ dict self.__OutputStatus
+        self.__outputs = OutputManager(self.write_outputs, self.__OutputPins, doorpi.DoorPi().scheduler, output_tick)
+        # the first write of every pin reaches the hardware - the state before is unknown
         for output_pin in self.__OutputPins:
             self.set_output(output_pin, 0, False)
 
@@ -61,56 +62,41 @@ class GPIO(KeyboardAbstractBaseClass):
     def destroy(self):
         logger.debug("GPIO.destroy()")
         # shutdown all output-pins
+        self.stop_patterns()
+        self.__outputs.destroy()
         for output_pin in self.__OutputPins:
             self.set_output(output_pin, 0, False)
         RPiGPIO.cleanup()
+        self.__inputs.destroy()
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
 
     def event_detect(self, pin):
-        logger.trace('event_detect for %s', pin)
-        self.__last_key = pin
-        doorpi.DoorPi().event_handler('OnKeyPressed', __name__, {'pin': pin})
-        doorpi.DoorPi().event_handler('OnKeyPressed_'+str(pin), __name__, {'pin': pin})
+        self.__inputs.edge(pin)
 
     def self_test(self):
         pass
 
-    @property
-    def pressed_keys(self):
-        pressed_keys = []
-        for input_pin in self.__InputPins:
-            if self.status_inputpin(input_pin):
-                pressed_keys.append(input_pin)
-        logger.trace("pressed_keys are %s" % pressed_keys)
-        return pressed_keys
-
-    @property
-    def pressed_key(self):
+    def read_input_port(self):
+        # RPi.GPIO has no port read - but every single read is only a memory access
+        mask = 0
         for input_pin in self.__InputPins:
-            if self.status_inputpin(input_pin):
-                logger.trace("pressed_key return key %s",str(input_pin))
-                return input_pin
-        return None
+            if RPiGPIO.input(input_pin): mask |= 1 << input_pin
+        return mask
 
     def status_inputpin(self, pin):
-        return RPiGPIO.input(pin)
+        return self.input_pressed(pin)
 
     def status_output(self, pin):
         pin = int(pin)
         if not pin in self.__OutputPins: return None
-        return self.__OutputStatus[pin]
+        return self.__outputs.get_output(pin)
 
     def set_output(self, pin, value, log_output = True):
-        pin = int(pin)
-        value = str(value).lower() in ['1', 'high', 'on']
-        log_output = str(log_output).lower() in ['true', 'log', '1', 'on']
-
-        if not pin in self.__OutputPins: return False
-        if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, value, log_output)
+        return self.__outputs.set_output(pin, value, log_output)
 
-        RPiGPIO.output(pin, value)
-        self.__OutputStatus[pin] = value
-        return True
+    def write_outputs(self, changes, outputs):
+        for pin, value in changes.items():
+            RPiGPIO.output(pin, value)
 
     get_input = status_inputpin
     get_output = status_output
\ No newline at end of file
@@ -8,6 +8,8 @@ logger.debug("%s loaded", __name__)
 import pifacedigitalio as p # basic for PiFce control
 
 from keyboard.AbstractBaseClass import KeyboardAbstractBaseClass
+from keyboard.outputs import OutputManager
+from keyboard.inputs import load_input_pipeline
 import doorpi
 
 class PiFace(KeyboardAbstractBaseClass):
@@ -20,33 +22,41 @@ class PiFace(KeyboardAbstractBaseClass):
     @property
     def output_pins(self): return self.__OutputPins
 
-    __OutputStatus = {}
+    __outputs = None
     @property
-    def output_status(self): return self.__OutputStatus
+    def outputs(self): return self.__outputs
+    @property
+    def output_status(self): return self.__outputs.status
 
-    __last_key = None
+    __inputs = None
+    @property
+    def inputs(self): return self.__inputs
     @property
-    def last_key(self):
-        return self.__last_key
+    def last_key(self): return self.__inputs.last_key
 
     __listener = None
 
-    def __init__(self, input_pins = [0,1,2,3,4,5,6,7], output_pins = [0,1,2,3,4,5,6,7]):
+    def __init__(self, input_pins = [0,1,2,3,4,5,6,7], output_pins = [0,1,2,3,4,5,6,7], bouncetime = None, output_tick = 0.01, input_ttl = 0.02):
         logger.debug("__init__(input_pins = %s, output_pins = %s)", input_pins, output_pins)
         self.__InputPins = map(int, input_pins)
         self.__OutputPins = map(int, output_pins)
-
-        doorpi.DoorPi().event_handler.register_event('OnKeyPressed', __name__)
+        self.input_ttl = input_ttl
 
         p.init()
+        self.__board = p.PiFaceDigital(init_board = False)
 
+        # PiFace never had a bouncetime - every press is fired unless one is configured
+        if bouncetime is None: bouncetime = 0
+        self.__inputs = load_input_pipeline(__name__, self.__InputPins, self.read_input, self.notify_edge_callbacks, bouncetime)
         self.__listener = p.InputEventListener()
         for input_pin in self.__InputPins:
+            # both edges - the pipeline reads the level after debounce anyway
             self.__listener.register(input_pin, p.IODIR_ON, self.event_detect)
-            doorpi.DoorPi().event_handler.register_event('OnKeyPressed_'+str(input_pin), __name__)
+            self.__listener.register(input_pin, p.IODIR_OFF, self.event_detect)
         self.__listener.activate()
 
-        # use set_output to register status @ dict self.__OutputStatus
+        self.__outputs = OutputManager(self.write_outputs, self.__OutputPins, doorpi.DoorPi().scheduler, output_tick)
+        # the first write of every pin reaches the hardware - the state before is unknown
         for output_pin in self.__OutputPins:
             self.set_output(output_pin, 0, False)
 
@@ -57,57 +67,45 @@ class PiFace(KeyboardAbstractBaseClass):
     def destroy(self):
         logger.debug("destroy")
         # shutdown all output-pins
+        self.stop_patterns()
+        self.__outputs.destroy()
         for output_pin in self.__OutputPins:
             self.set_output(output_pin, 0, False)
+        self.__listener.deactivate()
         p.deinit()
+        self.__inputs.destroy()
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
 
     def event_detect(self, event):
-        pin = event.pin_num
-        logger.trace('event_detect for %s', pin)
-        self.__last_key = pin
-        doorpi.DoorPi().event_handler('OnKeyPressed', __name__, {'pin': pin, 'event': event})
-        doorpi.DoorPi().event_handler('OnKeyPressed_'+str(pin), __name__, {'pin': pin, 'event': event})
+        self.__inputs.edge(event.pin_num)
 
     def self_test(self):
         pass
 
-    @property
-    def pressed_keys(self):
-        pressed_keys = []
-        for input_pin in self.__InputPins:
-            if self.status_inputpin(input_pin):
-                return_list.append(str(input_pin))
-        logger.trace("pressed_keys are %s" % pressed_keys)
-        return pressed_keys
-
-    @property
-    def pressed_key(self):
-        for input_pin in self.__InputPins:
-            if self.status_inputpin(input_pin):
-                logger.trace("pressed_key return key %s",str(input_pin))
-                return input_pin
-        return None
+    def read_input_port(self):
+        # all 8 inputs in one SPI transaction
+        return self.__board.input_port.value
 
     def status_inputpin(self, pin):
-        return p.digital_read(pin) == 1
+        return self.input_pressed(pin)
 
     def status_output(self, pin):
         pin = int(pin)
         if not pin in self.__OutputPins: return None
-        return self.__OutputStatus[pin]
+        return self.__outputs.get_output(pin)
 
     def set_output(self, pin, value, log_output = True):
-        pin = int(pin)
-        value = str(value).lower() in ['1', 'high', 'on']
-        log_output = str(log_output).lower() in ['true', 'log', '1', 'on']
-
-        if not pin in self.__OutputPins: return False
-        if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, value, log_output)
-
-        p.digital_write(pin, value)
-        self.__OutputStatus[pin] = value
-        return True
+        return self.__outputs.set_output(pin, value, log_output)
+
+    def write_outputs(self, changes, outputs):
+        if len(changes) == 1:
+            pin, value = changes.items()[0]
+            return p.digital_write(pin, value)
+        # one SPI transaction for the whole port - pins that are no output pins of DoorPi are low
+        port = 0
+        for pin, value in outputs.items():
+            if value: port |= 1 << pin
+        self.__board.output_port.value = port
 
     get_input = status_inputpin
     get_output = status_output
\ No newline at end of file
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import select # used by: InputPipeline.run
+import errno
+import threading
+import collections
+import time
+
+import doorpi
+
+EVENTS = ['OnKeyPressed', 'OnKeyReleased', 'OnKeyLongPressed', 'OnKeyDoublePressed']
+
+def load_input_pipeline(event_source, input_pins, read_input, pressed_callback = None, bouncetime = 0):
+    config = doorpi.DoorPi().config
+    return InputPipeline(
+        event_source = event_source,
+        input_pins = input_pins,
+        read_input = read_input,
+        event_handler = doorpi.DoorPi().event_handler,
+        pressed_callback = pressed_callback,
+        debounce = config.get_int('keyboard', 'debounce', 50),
+        long_press = config.get_int('keyboard', 'long_press', 2000),
+        double_press = config.get_int('keyboard', 'double_press', 0),
+        min_press_interval = bouncetime,
+        buffer_size = config.get_int('keyboard', 'input_buffer', 64)
+    )
+
+class InputPinState(object):
+    __slots__ = ('pressed', 'edge_at', 'settle_at', 'pressed_at', 'long_at', 'last_press', 'last_fired')
+
+    def __init__(self):
+        self.pressed = False
+        self.edge_at = None # first edge that is not settled yet
+        self.settle_at = None
+        self.pressed_at = None
+        self.long_at = None
+        self.last_press = None # for double presses
+        self.last_fired = None # for min_press_interval
+
+class InputPipeline(object):
+    """ edges of the input pins -> OnKeyPressed, OnKeyReleased, OnKeyLongPressed, OnKeyDoublePressed
+
+    The hardware callback only appends (pin, timestamp) to a ring buffer
+    (deque.append is atomic, no lock) and wakes the pipeline thread by a
+    pipe - it returns at once and no edge is lost while an action runs.
+    The thread reads the level of a pin debounce ms after its last edge
+    and only a changed level is a press or release, timestamped with the
+    first edge. A second press within double_press ms is a double press,
+    other presses within min_press_interval ms of the last OnKeyPressed
+    of the pin are dropped. The thread only wakes up for edges and due
+    deadlines - never to poll.
+    """
+
+    __last_key = None
+    @property
+    def last_key(self): return self.__last_key
+
+    @property
+    def status(self):
+        return {
+            'debounce': int(self.__debounce * 1000),
+            'long_press': int(self.__long_press * 1000),
+            'double_press': int(self.__double_press * 1000),
+            'min_press_interval': int(self.__min_press_interval * 1000),
+            'pressed': sorted(pin for pin, state in self.__states.items() if state.pressed),
+            'overflows': self.__overflows,
+            'rate_limited': self.__rate_limited
+        }
+
+    def __init__(self, event_source, input_pins, read_input, event_handler, pressed_callback = None,
+                 debounce = 50, long_press = 2000, double_press = 0, min_press_interval = 0, buffer_size = 64):
+        logger.debug("__init__ (input_pins = %s)", input_pins)
+        self.__event_source = event_source
+        self.__read_input = read_input
+        self.__event_handler = event_handler
+        self.__pressed_callback = pressed_callback
+        # milliseconds in the config, seconds inside
+        self.__debounce = debounce / 1000.0
+        self.__long_press = long_press / 1000.0
+        self.__double_press = double_press / 1000.0
+        self.__min_press_interval = min_press_interval / 1000.0
+        self.__edges = collections.deque(maxlen = buffer_size)
+        self.__states = dict((pin, InputPinState()) for pin in input_pins)
+        self.__overflows = 0
+        self.__rate_limited = 0
+        self.__destroy = False
+        self.__wakeup_read, self.__wakeup_write = os.pipe()
+
+        for event_name in EVENTS:
+            event_handler.register_event(event_name, event_source)
+            for pin in input_pins: event_handler.register_event(event_name+'_'+str(pin), event_source)
+
+        self.__thread = threading.Thread(target = self.run, name = 'input pipeline')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def destroy(self):
+        logger.debug("destroy")
+        self.__destroy = True
+        self.wakeup()
+        self.__thread.join(2)
+
+    def wakeup(self):
+        try: os.write(self.__wakeup_write, 'x')
+        except OSError: pass
+
+    def edge(self, pin):
+        """ called by the hardware callback - has to return at once """
+        if len(self.__edges) == self.__edges.maxlen: self.__overflows += 1
+        self.__edges.append((pin, time.time()))
+        self.wakeup()
+
+    def run(self):
+        while not self.__destroy:
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                if select.select([self.__wakeup_read], [], [], timeout)[0]:
+                    os.read(self.__wakeup_read, 512)
+            except select.error as ex:
+                if ex.args[0] != errno.EINTR: raise
+            while self.__edges:
+                pin, timestamp = self.__edges.popleft()
+                self.edge_received(pin, timestamp)
+            try: self.check_deadlines(time.time())
+            except: logger.exception('error in input pipeline')
+        os.close(self.__wakeup_read)
+        os.close(self.__wakeup_write)
+
+    def next_deadline(self):
+        deadlines = [deadline for state in self.__states.values() for deadline in (state.settle_at, state.long_at)
+                     if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def edge_received(self, pin, timestamp):
+        state = self.__states.get(pin)
+        if state is None: return
+        # every bounce moves the moment the level is read
+        if state.edge_at is None: state.edge_at = timestamp
+        state.settle_at = timestamp + self.__debounce
+
+    def check_deadlines(self, now):
+        for pin, state in self.__states.items():
+            if state.settle_at is not None and state.settle_at <= now:
+                timestamp = state.edge_at
+                state.edge_at = state.settle_at = None
+                level = bool(self.__read_input(pin))
+                if level == state.pressed: continue
+                state.pressed = level
+                if level: self.pressed(pin, state, timestamp)
+                else: self.released(pin, state, timestamp)
+            if state.long_at is not None and state.long_at <= now:
+                state.long_at = None
+                self.fire('OnKeyLongPressed', pin, {'pin': pin, 'timestamp': state.pressed_at})
+
+    def pressed(self, pin, state, timestamp):
+        state.pressed_at = timestamp
+        if self.__long_press > 0: state.long_at = timestamp + self.__long_press
+        self.__last_key = pin
+        if self.__pressed_callback is not None: self.__pressed_callback(pin)
+
+        if self.__double_press > 0 and state.last_press is not None and timestamp - state.last_press <= self.__double_press:
+            state.last_press = None
+            return self.fire('OnKeyDoublePressed', pin, {'pin': pin, 'timestamp': timestamp})
+        state.last_press = timestamp
+        if state.last_fired is not None and timestamp - state.last_fired < self.__min_press_interval:
+            self.__rate_limited += 1
+            logger.debug('pin %s pressed again within %s seconds - skip', pin, self.__min_press_interval)
+            return
+        state.last_fired = timestamp
+        self.fire('OnKeyPressed', pin, {'pin': pin, 'timestamp': timestamp})
+
+    def released(self, pin, state, timestamp):
+        state.long_at = None
+        duration = timestamp - state.pressed_at if state.pressed_at is not None else None
+        self.fire('OnKeyReleased', pin, {'pin': pin, 'timestamp': timestamp, 'duration': duration})
+
+    def fire(self, event_name, pin, kwargs):
+        self.__event_handler.fire_event_asynchron(event_name, self.__event_source, kwargs)
+        self.__event_handler.fire_event_asynchron(event_name+'_'+str(pin), self.__event_source, kwargs)
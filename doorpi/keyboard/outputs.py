@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+
+OUTPUT_VALUES = ['1', 'high', 'on', 'true']
+LOG_VALUES = ['true', 'log', '1', 'on']
+# out actions use the same few values again and again - every value is parsed once
+MAX_PARSED_VALUES = 256
+
+def parser_of(true_values):
+    parsed = {}
+    def parse(value):
+        try: return parsed[value]
+        except KeyError: pass
+        result = str(value).lower() in true_values
+        if len(parsed) < MAX_PARSED_VALUES: parsed[value] = result
+        return result
+    return parse
+
+to_output_value = parser_of(OUTPUT_VALUES)
+to_log_output = parser_of(LOG_VALUES)
+
+class OutputManager(object):
+    """ desired state of the output pins of a keyboard - only changes are written
+
+    set_output only stores the desired value. Writes within tick seconds
+    are written together by one job of the scheduler, so a pin that is
+    set to its current value (or back to it within the tick) costs no
+    hardware write at all. write_outputs(changes, outputs) of the keyboard
+    gets the changed pins and all desired values - PiFace writes the
+    whole port at once if more than one pin has changed. With tick 0
+    every change is written at once.
+    """
+
+    @property
+    def status(self): return dict(self.__desired)
+
+    @property
+    def writes(self): return self.__writes
+
+    def __init__(self, write_outputs, output_pins, scheduler = None, tick = 0.01):
+        logger.debug("__init__ (output_pins = %s, tick = %s)", output_pins, tick)
+        self.__write_outputs = write_outputs
+        self.__output_pins = set(output_pins)
+        self.__scheduler = scheduler
+        self.__tick = tick
+        self.__desired = {} # pin -> bool
+        self.__written = {} # pin -> bool, what the hardware has
+        self.__flush_job = None
+        self.__writes = 0
+        self.__lock = threading.Lock()
+
+    def get_output(self, pin):
+        return self.__desired.get(pin)
+
+    def set_output(self, pin, value, log_output = True):
+        pin = int(pin)
+        if pin not in self.__output_pins: return False
+        value = to_output_value(value)
+        if to_log_output(log_output): logger.debug("out(pin = %s, value = %s)", pin, value)
+
+        with self.__lock:
+            self.__desired[pin] = value
+            if self.__flush_job is not None: return True
+            if self.__written.get(pin) == value: return True
+            if self.__tick > 0 and self.__scheduler is not None:
+                self.__flush_job = self.__scheduler.add_job_in(self.__tick, self.flush, name = 'write outputs')
+                # None - the scheduler is already destroyed, write at once
+                if self.__flush_job is not None: return True
+        return self.flush()
+
+    def flush(self):
+        """ writes all changed pins now - also used at destroy when the scheduler is gone """
+        with self.__lock:
+            if self.__scheduler is not None: self.__scheduler.cancel_job(self.__flush_job)
+            self.__flush_job = None
+            changes = dict((pin, value) for pin, value in self.__desired.items() if self.__written.get(pin) != value)
+            if not changes: return True
+            # under the lock - writes have to reach the hardware in the order they were flushed
+            try: self.__write_outputs(changes, dict(self.__desired))
+            except:
+                logger.exception('error while writing outputs %s', changes)
+                return False
+            self.__written.update(changes)
+            self.__writes += 1
+        logger.trace('wrote outputs %s', changes)
+        return True
+
+    def destroy(self):
+        with self.__lock:
+            if self.__scheduler is not None: self.__scheduler.cancel_job(self.__flush_job)
+            self.__flush_job = None
+            self.__scheduler = None
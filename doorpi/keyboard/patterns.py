@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import time
+
+from keyboard.outputs import to_output_value
+
+def blink_sequence(on_ms, off_ms):
+    return [(True, on_ms), (False, off_ms)]
+
+class OutputPattern(object):
+    """ sequence of (value, milliseconds) on one output pin
+
+    One repeating job of the scheduler steps through the sequence - no
+    event, no action and no own thread per LED. The next step is timed
+    from the planned (not the actual) time of the last one, so a blinking
+    LED does not drift; after a long block missed steps are skipped.
+    """
+
+    @property
+    def pin(self): return self.__pin
+
+    @property
+    def status(self):
+        return {
+            'sequence': [(int(value), int(seconds * 1000)) for value, seconds in self.__sequence],
+            'repeat': self.__repeat
+        }
+
+    def __init__(self, set_output, scheduler, pin, sequence, repeat = True, finished = None):
+        if not sequence: raise ValueError('pattern for pin %s without steps' % pin)
+        self.__set_output = set_output
+        self.__scheduler = scheduler
+        self.__pin = pin
+        self.__sequence = [(to_output_value(value), float(milliseconds) / 1000) for value, milliseconds in sequence]
+        self.__repeat = repeat
+        self.__finished = finished
+        self.__index = 0
+        self.__job = None
+
+    def start(self):
+        value, seconds = self.__sequence[0]
+        self.__set_output(self.__pin, value, False)
+        self.__job = self.__scheduler.add_job_in(
+            seconds = seconds,
+            callback = self.step,
+            name = 'pattern on pin %s' % self.__pin,
+            next_timestamp = self.next_timestamp
+        )
+
+    def stop(self):
+        self.__scheduler.cancel_job(self.__job)
+        self.__job = None
+
+    def step(self):
+        self.__index += 1
+        if self.__index >= len(self.__sequence):
+            if not self.__repeat:
+                self.stop()
+                if self.__finished is not None: self.__finished(self)
+                return
+            self.__index = 0
+        self.__set_output(self.__pin, self.__sequence[self.__index][0], False)
+
+    def next_timestamp(self, last_timestamp):
+        seconds = self.__sequence[self.__index][1]
+        return max(last_timestamp, time.time() - seconds) + seconds
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import logging.handlers
+import threading
+import collections
+import atexit
+import sys
+import os
+import time
+
+TRACE_LEVEL = 5
+LOG_FORMAT = '%(asctime)s [%(levelname)s]  \t[%(name)s] %(message)s'
+DEFAULT_LOG_FILENAME = '/var/log/doorpi/doorpi.log'
+# records waiting for the listener - if it can't keep up, the oldest are dropped
+QUEUE_SIZE = 10000
+
+def add_trace_level():
+    logging.addLevelName(TRACE_LEVEL, "TRACE")
+    def trace(self, message, *args, **kws):
+        # only build the record if someone wants it - trace is called in hot paths
+        if self.isEnabledFor(TRACE_LEVEL):
+            # Yes, logger takes its '*args' as 'args'.
+            self._log(TRACE_LEVEL, message, args, **kws)
+    logging.Logger.trace = trace
+
+def level_of(value):
+    if isinstance(value, int): return value
+    if value.isdigit(): return int(value)
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int): raise ValueError('log level %s is unknown' % value)
+    return level
+
+class QueueHandler(logging.Handler):
+    """ only puts the record into the queue - formatting and writing is done by the QueueListener """
+
+    def __init__(self, listener):
+        logging.Handler.__init__(self)
+        self.listener = listener
+
+    def prepare(self, record):
+        # the listener formats later in an other thread - args and exc_info can change until then
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try: self.listener.put(self.prepare(record))
+        except Exception: self.handleError(record)
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """ RotatingFileHandler that only writes to disk once per batch of the QueueListener
+
+    flush() does nothing, the buffered file is written by flush_batch().
+    The size for the rollover is counted here, because seek/tell of the
+    original shouldRollover would flush the buffer for every record.
+    """
+
+    def _open(self):
+        stream = logging.handlers.RotatingFileHandler._open(self)
+        try: self.size = os.path.getsize(self.baseFilename)
+        except OSError: self.size = 0
+        return stream
+
+    def emit(self, record):
+        try:
+            message = self.format(record) + '\n'
+            if isinstance(message, unicode): message = message.encode('utf-8')
+            if self.maxBytes > 0 and self.size + len(message) >= self.maxBytes: self.doRollover()
+            if self.stream is None: self.stream = self._open()
+            self.stream.write(message)
+            self.size += len(message)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        logging.handlers.RotatingFileHandler.flush(self)
+
+class QueueListener(object):
+    """ writes the queued records in its own thread, batch_interval seconds collected into one write """
+
+    @property
+    def dropped(self): return self.__dropped
+
+    @property
+    def handlers(self): return self.__handlers
+
+    def __init__(self, handlers, batch_interval = 1.0, queue_size = QUEUE_SIZE):
+        self.__handlers = list(handlers)
+        self.__batch_interval = batch_interval
+        self.__records = collections.deque(maxlen = queue_size)
+        self.__condition = threading.Condition()
+        self.__dropped = 0
+        self.__stop = False
+        self.__thread = None
+
+    def set_handlers(self, handlers, batch_interval = None):
+        with self.__condition:
+            old_handlers = self.__handlers
+            self.__handlers = list(handlers)
+            if batch_interval is not None: self.__batch_interval = batch_interval
+        for handler in old_handlers:
+            if handler not in self.__handlers: handler.close()
+
+    def put(self, record):
+        with self.__condition:
+            if len(self.__records) == self.__records.maxlen: self.__dropped += 1
+            self.__records.append(record)
+            self.__condition.notify()
+
+    def start(self):
+        # also after a fork (daemon) - the thread of the parent does not exist in the child
+        if self.__thread is not None and self.__thread.is_alive(): return
+        self.__thread = threading.Thread(target = self.run, name = 'log writer')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """ writes all queued records """
+        with self.__condition:
+            self.__stop = True
+            self.__condition.notify()
+        if self.__thread is not None: self.__thread.join()
+        self.__thread = None
+
+    def run(self):
+        while True:
+            with self.__condition:
+                # no timeout - python 2 would poll
+                while not self.__records and not self.__stop: self.__condition.wait()
+                records = list(self.__records)
+                self.__records.clear()
+                handlers = self.__handlers
+                stop = self.__stop
+            self.handle(records, handlers)
+            if stop: return
+            # records of the next batch_interval seconds are written together
+            time.sleep(self.__batch_interval)
+
+    def handle(self, records, handlers):
+        for record in records:
+            for handler in handlers:
+                if record.levelno >= handler.level: handler.handle(record)
+        for handler in handlers:
+            if hasattr(handler, 'flush_batch'): handler.flush_batch()
+            else: handler.flush()
+
+__listener = None
+# loggers with an own level from [LogLevels] - reset when they are gone at a reload
+__module_loggers = set()
+
+def create_handlers(filename, max_bytes, backup_count, file_level, console_level):
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(console_level)
+    console.setFormatter(formatter)
+    handlers.append(console)
+
+    if filename:
+        try:
+            logfile = BatchedRotatingFileHandler(filename, maxBytes = max_bytes, backupCount = backup_count)
+            logfile.setLevel(file_level)
+            logfile.setFormatter(formatter)
+            handlers.append(logfile)
+        except IOError as ex:
+            sys.stderr.write('could not open logfile %s (%s) - only log to console\n' % (filename, ex))
+    return handlers
+
+def start_logging(filename = DEFAULT_LOG_FILENAME, level = logging.INFO, max_bytes = 25000, backup_count = 5):
+    """ root logger -> QueueHandler -> QueueListener (own thread) -> console and logfile """
+    global __listener
+    add_trace_level()
+    __listener = QueueListener(create_handlers(filename, max_bytes, backup_count, level, level))
+    __listener.start()
+    atexit.register(__listener.stop)
+
+    root = logging.getLogger('')
+    root.setLevel(level)
+    root.addHandler(QueueHandler(__listener))
+    return __listener
+
+def configure_logging(config):
+    """ [Logging] level, file_level, console_level, filename, max_bytes, backup_count, batch_interval
+        and [LogLevels] <logger name> = <level> for single modules (e.g. action.handler = TRACE)
+    """
+    level = level_of(config.get('Logging', 'level', 'INFO'))
+    file_level = level_of(config.get('Logging', 'file_level', str(level)))
+    console_level = level_of(config.get('Logging', 'console_level', str(level)))
+
+    # case insensitive, because the config lowercases keys (action.SingleActions.out)
+    loggers = dict((name.lower(), name) for name in logging.Logger.manager.loggerDict)
+    module_levels = {}
+    for name in config.get_keys('LogLevels'):
+        module_levels[loggers.get(name, name)] = level_of(config.get('LogLevels', name))
+    global __module_loggers
+    for name in __module_loggers - set(module_levels):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+    __module_loggers = set(module_levels)
+
+    # the root level decides which records are built at all - modules with an own level pass every output
+    logging.getLogger('').setLevel(min(file_level, console_level))
+
+    if __listener is not None:
+        __listener.set_handlers(
+            create_handlers(
+                filename = config.get('Logging', 'filename', DEFAULT_LOG_FILENAME),
+                max_bytes = config.get_int('Logging', 'max_bytes', 25000),
+                backup_count = config.get_int('Logging', 'backup_count', 5),
+                file_level = min([file_level] + module_levels.values()),
+                console_level = min([console_level] + module_levels.values())
+            ),
+            batch_interval = config.get_float('Logging', 'batch_interval', 1.0)
+        )
+        __listener.start()
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""provide intercomstation to the doorstation by VoIP"""
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import smtplib
+import socket
+import threading
+import itertools
+import time
+from email.mime.multipart import MIMEMultipart # used by: MailOutbox.build_message
+from email.mime.text import MIMEText # used by: MailOutbox.build_message
+from email.header import Header # used by: MailOutbox.build_message
+from email.Utils import COMMASPACE # used by: MailOutbox.build_message
+
+import doorpi
+from mail.spool import MailSpool
+from status.metrics import metrics
+
+def load_mail_outbox():
+    config = doorpi.DoorPi().config
+    connection = SmtpConnection(
+        host = config.get('SMTP', 'server'),
+        port = config.get_int('SMTP', 'port', 25),
+        username = config.get('SMTP', 'username'),
+        password = config.get('SMTP', 'password'),
+        use_tls = config.get_boolean('SMTP', 'use_tls'),
+        need_login = config.get_boolean('SMTP', 'need_login'),
+        timeout = config.get_int('SMTP', 'timeout', 30)
+    )
+    return MailOutbox(
+        connection = connection,
+        spool = MailSpool(config.get('SMTP', 'spool', '/var/spool/doorpi/mail')),
+        scheduler = doorpi.DoorPi().scheduler,
+        sender = config.get('SMTP', 'from'),
+        signature = '\nsent by:\n' + doorpi.DoorPi().epilog,
+        batch_window = config.get_int('SMTP', 'batch_window', 5),
+        retry_interval = config.get_int('SMTP', 'retry_interval', 30),
+        retry_max_interval = config.get_int('SMTP', 'retry_max_interval', 1800),
+        max_attempts = config.get_int('SMTP', 'max_attempts', 10),
+        keep_alive = config.get_int('SMTP', 'keep_alive', 60)
+    )
+
+def to_unicode(value):
+    if isinstance(value, str): return value.decode('utf-8', 'replace')
+    return value
+
+def is_permanent_error(ex):
+    if isinstance(ex, smtplib.SMTPRecipientsRefused): return True
+    return isinstance(ex, smtplib.SMTPDataError) and ex.smtp_code >= 500
+
+class SmtpConnection(object):
+    """ keeps one connection to the SMTP server open between mails """
+
+    @property
+    def connected(self): return self.__server is not None
+
+    def __init__(self, host, port = 25, username = '', password = '', use_tls = False, need_login = False, timeout = 30):
+        self.__host = host
+        self.__port = port
+        self.__username = username
+        self.__password = password
+        self.__use_tls = use_tls
+        self.__need_login = need_login
+        self.__timeout = timeout
+        self.__server = None
+
+    def connect(self):
+        logger.debug('connect to %s:%s', self.__host, self.__port)
+        server = smtplib.SMTP(timeout = self.__timeout)
+        server.connect(self.__host, self.__port)
+        server.ehlo()
+        if self.__use_tls:
+            server.starttls()
+            server.ehlo()
+        if self.__need_login: server.login(self.__username, self.__password)
+        self.__server = server
+
+    def close(self):
+        if self.__server is None: return
+        logger.debug('close connection to %s:%s', self.__host, self.__port)
+        try: self.__server.quit()
+        except (smtplib.SMTPException, socket.error): pass
+        self.__server = None
+
+    def sendmail(self, sender, recipients, message):
+        if self.__server is not None:
+            try: return self.__server.sendmail(sender, recipients, message)
+            except (smtplib.SMTPServerDisconnected, socket.error):
+                # the server closed the idle connection meanwhile - try once again with a new one
+                logger.debug('connection to %s:%s lost - reconnect', self.__host, self.__port)
+                self.__server = None
+        self.connect()
+        return self.__server.sendmail(sender, recipients, message)
+
+class MailOutbox(object):
+    """ sends the mails of mailto actions in a background thread
+
+    send() only spools the mail and returns, so a slow or unreachable
+    SMTP server never delays the event thread. Mails to the same
+    recipients within batch_window seconds after a sent mail are
+    collected and sent as one mail. Failed mails are retried with
+    exponential backoff and moved to <spool>/failed after max_attempts
+    or a permanent error. Timers (batch window, retry, idle connection)
+    are jobs of the scheduler that only wake up the sender thread.
+    """
+
+    @property
+    def queued(self): return len(self.__mails)
+
+    @property
+    def status(self):
+        return {
+            'queued': len(self.__mails),
+            'spool': self.__spool.directory,
+            'connected': self.__connection.connected
+        }
+
+    def __init__(self, connection, spool, scheduler, sender, signature = '', batch_window = 5,
+                 retry_interval = 30, retry_max_interval = 1800, max_attempts = 10, keep_alive = 60):
+        logger.debug("__init__")
+        self.__connection = connection
+        self.__spool = spool
+        self.__scheduler = scheduler
+        self.__sender = sender
+        self.__signature = signature
+        self.__batch_window = batch_window
+        self.__retry_interval = retry_interval
+        self.__retry_max_interval = retry_max_interval
+        self.__max_attempts = max_attempts
+        self.__keep_alive = keep_alive
+
+        self.__mails = []
+        self.__last_sent = {} # recipients -> timestamp
+        self.__last_activity = 0
+        self.__ids = itertools.count()
+        self.__condition = threading.Condition()
+        self.__wakeup_job = None
+        self.__destroy = False
+        self.__thread = None
+
+    def start(self):
+        mails = self.__spool.load()
+        with self.__condition:
+            self.__mails.extend(mails)
+        if mails: metrics.increment('doorpi_smtp_queue_depth', value = len(mails))
+        self.__thread = threading.Thread(target = self.run, name = 'mail outbox')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def destroy(self, timeout = 5):
+        """ sends the mails that are due now - all others stay in the spool for the next start """
+        logger.debug("destroy")
+        with self.__condition:
+            self.__destroy = True
+            self.__scheduler.cancel_job(self.__wakeup_job)
+            self.__condition.notify()
+        if self.__thread is not None: self.__thread.join(timeout)
+        self.__thread = None
+
+    def send(self, recipients, subject, text):
+        mail = {
+            'id': '%d-%04d' % (time.time() * 1000, next(self.__ids) % 10000),
+            'to': [to_unicode(recipient) for recipient in recipients],
+            'subject': to_unicode(subject),
+            'text': to_unicode(text),
+            'created': time.time(),
+            'attempts': 0,
+            'next_attempt': 0
+        }
+        self.__spool.save(mail)
+        with self.__condition:
+            self.__mails.append(mail)
+            self.__condition.notify()
+        metrics.increment('doorpi_smtp_queue_depth')
+        logger.debug('queued mail %s to %s', mail['id'], mail['to'])
+        return True
+
+    def wakeup(self):
+        with self.__condition:
+            self.__condition.notify()
+
+    @staticmethod
+    def recipients_of(mail):
+        return tuple(sorted(mail['to']))
+
+    def due(self, mail):
+        return max(mail['next_attempt'], self.__last_sent.get(self.recipients_of(mail), 0) + self.__batch_window)
+
+    def next_batch(self, now):
+        """ first due mail together with all other due mails to the same recipients """
+        for mail in self.__mails:
+            if self.due(mail) > now: continue
+            recipients = self.recipients_of(mail)
+            return [other for other in self.__mails
+                    if self.recipients_of(other) == recipients and other['next_attempt'] <= now]
+        return None
+
+    def schedule_wakeup(self):
+        self.__scheduler.cancel_job(self.__wakeup_job)
+        self.__wakeup_job = None
+        timestamps = [self.due(mail) for mail in self.__mails]
+        if self.__connection.connected: timestamps.append(self.__last_activity + self.__keep_alive)
+        if timestamps:
+            self.__wakeup_job = self.__scheduler.add_job(min(timestamps), self.wakeup, name = 'mail outbox')
+
+    def run(self):
+        while True:
+            batch = None
+            idle = False
+            with self.__condition:
+                while True:
+                    now = time.time()
+                    batch = self.next_batch(now)
+                    if batch or self.__destroy: break
+                    idle = self.__connection.connected and now >= self.__last_activity + self.__keep_alive
+                    if idle: break
+                    self.schedule_wakeup()
+                    # no timeout - python 2 would poll, the scheduler wakes this thread up when something is due
+                    self.__condition.wait()
+
+            if batch: self.deliver(batch)
+            elif idle: self.__connection.close()
+            else: break
+        self.__connection.close()
+
+    def build_message(self, batch):
+        subject = batch[0]['subject']
+        if len(batch) > 1: subject += ' (+%s)' % (len(batch) - 1)
+        text = u'<hr />'.join([mail['text'] for mail in batch])
+
+        msg = MIMEMultipart()
+        msg['From'] = self.__sender
+        msg['To'] = COMMASPACE.join(batch[0]['to'])
+        msg['Subject'] = Header(subject.encode('utf-8'), 'utf-8')
+        msg.attach(MIMEText(text.encode('utf-8'), 'html', 'utf-8'))
+        msg.attach(MIMEText(self.__signature, 'plain'))
+        return msg.as_string()
+
+    def deliver(self, batch):
+        try:
+            self.__connection.sendmail(self.__sender, batch[0]['to'], self.build_message(batch))
+        except Exception as ex:
+            return self.delivery_failed(batch, ex)
+        finally:
+            self.__last_activity = time.time()
+
+        with self.__condition:
+            for mail in batch: self.__mails.remove(mail)
+            self.__last_sent[self.recipients_of(batch[0])] = time.time()
+        for mail in batch: self.__spool.remove(mail)
+        metrics.increment('doorpi_smtp_queue_depth', value = -len(batch))
+        metrics.increment('doorpi_smtp_sent', value = len(batch))
+        logger.info('sent %s mail(s) to %s', len(batch), batch[0]['to'])
+        return True
+
+    def delivery_failed(self, batch, ex):
+        permanent = is_permanent_error(ex)
+        if not permanent: self.__connection.close()
+
+        retry, failed = [], []
+        with self.__condition:
+            for mail in batch:
+                mail['attempts'] += 1
+                mail['last_error'] = str(ex)
+                if permanent or mail['attempts'] >= self.__max_attempts:
+                    self.__mails.remove(mail)
+                    failed.append(mail)
+                else:
+                    backoff = min(self.__retry_interval * 2 ** (mail['attempts'] - 1), self.__retry_max_interval)
+                    mail['next_attempt'] = time.time() + backoff
+                    retry.append(mail)
+
+        for mail in retry:
+            self.__spool.save(mail)
+            logger.warning("couldn't send mail %s (attempt %s, retry in %s seconds): %s",
+                           mail['id'], mail['attempts'], int(mail['next_attempt'] - time.time()), ex)
+        for mail in failed:
+            self.__spool.save(mail)
+            self.__spool.move_to_failed(mail)
+            logger.error("couldn't send mail %s after %s attempt(s) - giving up: %s", mail['id'], mail['attempts'], ex)
+        if retry: metrics.increment('doorpi_smtp_retries', value = len(retry))
+        if failed:
+            metrics.increment('doorpi_smtp_queue_depth', value = -len(failed))
+            metrics.increment('doorpi_smtp_failed', value = len(failed))
+        return False
+
+metrics.describe('doorpi_smtp_queue_depth', 'gauge', 'mails waiting to be sent')
+metrics.describe('doorpi_smtp_sent', 'counter', 'mails sent')
+metrics.describe('doorpi_smtp_retries', 'counter', 'failed attempts that will be retried')
+metrics.describe('doorpi_smtp_failed', 'counter', 'mails that could not be sent')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import json
+
+class MailSpool(object):
+    """ one json file per queued mail, so mails survive a restart
+
+    Files are written to a temporary name and renamed, a crash never
+    leaves a half written mail. Without a usable directory the spool
+    only keeps the mails in memory.
+    """
+
+    __directory = None
+    @property
+    def directory(self): return self.__directory
+
+    def __init__(self, directory):
+        self.__directory = None
+        if not directory: return
+        try:
+            if not os.path.isdir(directory): os.makedirs(directory)
+            self.__directory = directory
+        except OSError as ex:
+            logger.warning('spool directory %s not usable (%s) - mails are only queued in memory', directory, ex)
+
+    def filename(self, mail_id, folder = ''):
+        return os.path.join(self.__directory, folder, mail_id + '.json')
+
+    def load(self):
+        mails = []
+        if self.__directory is None: return mails
+        for filename in sorted(os.listdir(self.__directory)):
+            if not filename.endswith('.json'): continue
+            try:
+                with open(os.path.join(self.__directory, filename)) as spool_file:
+                    mails.append(json.load(spool_file))
+            except (IOError, ValueError) as ex:
+                logger.error('could not load spooled mail %s (%s)', filename, ex)
+        logger.info('loaded %s mails from spool %s', len(mails), self.__directory)
+        return mails
+
+    def save(self, mail):
+        if self.__directory is None: return False
+        filename = self.filename(mail['id'])
+        try:
+            with open(filename + '.tmp', 'w') as spool_file:
+                json.dump(mail, spool_file)
+            os.rename(filename + '.tmp', filename)
+        except (IOError, OSError) as ex:
+            logger.error('could not spool mail %s (%s)', mail['id'], ex)
+            return False
+        return True
+
+    def remove(self, mail):
+        if self.__directory is None: return False
+        try: os.remove(self.filename(mail['id']))
+        except OSError as ex:
+            logger.warning('could not remove spooled mail %s (%s)', mail['id'], ex)
+            return False
+        return True
+
+    def move_to_failed(self, mail):
+        """ keeps mails that could not be sent for a manual look """
+        if self.__directory is None: return False
+        try:
+            if not os.path.isdir(os.path.join(self.__directory, 'failed')):
+                os.makedirs(os.path.join(self.__directory, 'failed'))
+            os.rename(self.filename(mail['id']), self.filename(mail['id'], 'failed'))
+        except OSError as ex:
+            logger.warning('could not move mail %s to failed (%s)', mail['id'], ex)
+            return False
+        return True
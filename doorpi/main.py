@@ -4,45 +4,13 @@
 import argparse
 import sys
 import logging
-import logging.handlers
 #----------
 import metadata
 import doorpi
-
-TRACE_LEVEL = 5
-LOG_FORMAT = '%(asctime)s [%(levelname)s]  \t[%(name)s] %(message)s'
-DEFAULT_LOG_FILENAME = '/var/log/doorpi/doorpi.log'
-
-def add_trace_level():
-    logging.addLevelName(TRACE_LEVEL, "TRACE")
-    def trace(self, message, *args, **kws):
-        # Yes, logger takes its '*args' as 'args'.
-        self._log(TRACE_LEVEL, message, args, **kws)
-    logging.Logger.trace = trace
+from log.pipeline import start_logging, DEFAULT_LOG_FILENAME
 
 def init_logger():
-    add_trace_level()
-    logging.basicConfig(
-        filename = DEFAULT_LOG_FILENAME,
-        level = TRACE_LEVEL,
-        format = LOG_FORMAT
-    #    datefmt = '%m/%d/%Y %I:%M:%S %p'
-    )
-    # define a Handler which writes INFO messages or higher to the sys.stderr
-    console = logging.StreamHandler()
-    console.setLevel(TRACE_LEVEL)
-    console.setFormatter(logging.Formatter(LOG_FORMAT))
-
-    logrotating = logging.handlers.RotatingFileHandler(
-          DEFAULT_LOG_FILENAME,
-          maxBytes=25000,
-          backupCount=5
-    )
-
-    # add the handler to the root logger
-    logging.getLogger('').addHandler(console)
-    logging.getLogger('').addHandler(logrotating)
-
+    start_logging(DEFAULT_LOG_FILENAME)
     return logging.getLogger(__name__)
 
 def parse_arguments(argv):
@@ -82,10 +50,22 @@ def get_status_from_doorpi(argv):
         return 1
     return 0
 
-def main_as_daemon(argv):
-    if argv[1] is 'reload':
-        print 'not implemeted now - use restart instead'
+def reload_doorpi(argv):
+    # the running DoorPi reads its configfile again on SIGHUP
+    try:
+        import os
+        import signal
+        pid = int(open(doorpi.DoorPi().pidfile_path).read().strip())
+        os.kill(pid, signal.SIGHUP)
+        print "sent reload to DoorPi with pid %s" % pid
+    except Exception as ex:
+        print ex
         return 1
+    return 0
+
+def main_as_daemon(argv):
+    if argv[1] == 'reload':
+        return reload_doorpi(argv)
     if argv[1] in ['stop']:
         parsed_arguments = None
     else:
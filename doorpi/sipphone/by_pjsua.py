@@ -7,6 +7,7 @@ logger.debug("%s loaded", __name__)
 
 import datetime # used by: get_new_recorder, start
 import os # used by: Pjsua.start
+import threading # used by: Pjsua.register_thread
 
 import pjsua
 
@@ -15,6 +16,7 @@ import pjsua_lib.SipPhoneCallCallBack
 
 from media.CreateDialTone import generate_dial_tone
 from doorpi import DoorPi
+from status.metrics import metrics
 
 class Pjsua:
     name = 'pjsua'
@@ -40,6 +42,8 @@ class Pjsua:
         return DoorPi().parse_string(self.__RecorderFilename)
 
     __RecorderID = None
+    __RecorderCurrentFilename = None
+    __RecorderBytesWritten = 0
     def get_recorder_id(self):
         return self.__RecorderID
 
@@ -58,6 +62,7 @@ class Pjsua:
         self.__RecorderID = self.__Lib.create_recorder(
             filename = recorder_filename
         )
+        self.__RecorderCurrentFilename = recorder_filename
         logger.debug('created new recorder with filename %s', recorder_filename)
         DoorPi().event_handler('OnSipPhoneRecorderCreate', __name__, {
             'rec_id': self.__RecorderID,
@@ -69,6 +74,8 @@ class Pjsua:
         return self.get_recorder_slot()
     def stop_recorder(self):
         self.__Lib.recorder_destroy(self.get_recorder_id())
+        self.__RecorderBytesWritten = self.recorder_bytes_written
+        self.__RecorderCurrentFilename = None
         DoorPi().event_handler('OnSipPhoneRecorderDestroy', __name__, {
             'rec_id': self.__RecorderID
         })
@@ -79,6 +86,13 @@ class Pjsua:
             return
         self.stop_recorder()
 
+    @property
+    def recorder_bytes_written(self):
+        bytes_written = self.__RecorderBytesWritten
+        if self.__RecorderCurrentFilename is not None and os.path.isfile(self.__RecorderCurrentFilename):
+            bytes_written += os.path.getsize(self.__RecorderCurrentFilename)
+        return bytes_written
+
     __current_call = None
     @property
     def current_call(self): return self.__current_call
@@ -114,6 +128,15 @@ class Pjsua:
         self.__current_callcallback = callback
         return self.current_callcallback
 
+    # pjsua only accepts calls from threads it knows - once per thread is enough
+    __registered_threads = threading.local()
+    def register_thread(self):
+        if self.__Lib is None: return False
+        if not getattr(self.__registered_threads, 'registered', False):
+            self.__Lib.thread_register(threading.current_thread().name)
+            self.__registered_threads.registered = True
+        return True
+
     def __init__(self):
         logger.debug("__init__")
         DoorPi().event_handler.register_event('OnSipPhoneCreate', __name__)
@@ -184,6 +207,7 @@ class Pjsua:
                 logger.debug('use %s as recordfile', self.__RecorderFilename)
                 logger.debug(' for example at this moment: %s', self.parsed_recorder_filename)
 
+            self.register_metrics()
             DoorPi().event_handler('OnSipPhoneStart', __name__)
             logger.debug("start successfully")
 
@@ -203,6 +227,7 @@ class Pjsua:
     def destroy(self):
         logger.debug("destroy")
         DoorPi().event_handler('OnDestroySipPhone', __name__)
+        self.unregister_metrics()
 
         if self.current_callcallback is not None:
             self.current_callcallback.destroy()
@@ -236,6 +261,35 @@ class Pjsua:
 
         DoorPi().event_handler.unregister_source(__name__, True)
 
+    def register_metrics(self):
+        metrics.register_collector('doorpi_call_active', 'gauge', 'call is running', self.collect_call_active)
+        metrics.register_collector('doorpi_call_state', 'gauge', 'state of the current call', self.collect_call_state)
+        metrics.register_collector('doorpi_call_duration_seconds', 'gauge', 'duration of the current call', self.collect_call_duration)
+        metrics.register_collector('doorpi_signal_level', 'gauge', 'signal level of the sound device (0 - 1)', self.collect_signal_level)
+        metrics.register_collector('doorpi_recorder_bytes_written', 'counter', 'bytes written by the recorder', lambda: self.recorder_bytes_written)
+
+    def unregister_metrics(self):
+        for name in ['doorpi_call_active', 'doorpi_call_state', 'doorpi_call_duration_seconds',
+                     'doorpi_signal_level', 'doorpi_recorder_bytes_written']:
+            metrics.unregister_collector(name)
+
+    def collect_call_active(self):
+        return self.current_call is not None
+
+    # the collectors run in the threads of the webservice
+    def collect_call_state(self):
+        if self.current_call is None or not self.register_thread(): return []
+        return [((('state', self.current_call.info().state_text),), 1)]
+
+    def collect_call_duration(self):
+        if self.current_call is None or not self.register_thread(): return 0
+        return self.current_call.info().total_time
+
+    def collect_signal_level(self):
+        if not self.register_thread(): return None
+        tx_level, rx_level = self.__Lib.conf_get_signal_level(0)
+        return [((('direction', 'tx'),), tx_level), ((('direction', 'rx'),), rx_level)]
+
     def selftest(self):
         logger.debug("selftest")
 
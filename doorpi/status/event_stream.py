@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import collections
+import json
+import time
+
+import doorpi
+
+def load_event_stream():
+    return EventStream(
+        event_handler = doorpi.DoorPi().event_handler,
+        scheduler = doorpi.DoorPi().scheduler,
+        max_clients = doorpi.DoorPi().config.get_int('Webservice', 'stream_clients', 4),
+        buffer_size = doorpi.DoorPi().config.get_int('Webservice', 'stream_buffer', 100),
+        heartbeat = doorpi.DoorPi().config.get_int('Webservice', 'stream_heartbeat', 15)
+    )
+
+class EventStreamClient(object):
+    """ bounded buffer of one subscriber - if it is full, the oldest message is dropped """
+
+    __dropped = 0
+    @property
+    def dropped(self): return self.__dropped
+
+    def __init__(self, buffer_size):
+        self.__messages = collections.deque(maxlen = buffer_size)
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__dropped = 0
+
+    def put(self, message):
+        with self.__condition:
+            if len(self.__messages) == self.__messages.maxlen: self.__dropped += 1
+            self.__messages.append(message)
+            self.__condition.notify()
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+
+    def get(self):
+        """ blocks until there are messages - returns None after close """
+        with self.__condition:
+            # no timeout - python 2 would poll, the heartbeat of EventStream wakes up idle clients
+            while not self.__messages and not self.__closed: self.__condition.wait()
+            if self.__closed: return None
+            messages = list(self.__messages)
+            self.__messages.clear()
+            return messages
+
+class EventStream(object):
+    """ pushes every fired event to the subscribed clients (Server-Sent Events)
+
+    fire_event_synchron only appends the serialized event to the buffer
+    of every client and never waits for a client. A slow client loses
+    its oldest events instead - the number is sent with the next message.
+    Without subscribers an event costs one check.
+    """
+
+    @property
+    def clients(self): return len(self.__clients)
+
+    @property
+    def status(self):
+        return {
+            'clients': len(self.__clients),
+            'max_clients': self.__max_clients,
+            'buffer_size': self.__buffer_size,
+            'last_id': self.__last_id
+        }
+
+    def __init__(self, event_handler, scheduler, max_clients = 4, buffer_size = 100, heartbeat = 15):
+        logger.debug("__init__")
+        self.__event_handler = event_handler
+        self.__scheduler = scheduler
+        self.__max_clients = max_clients
+        self.__buffer_size = buffer_size
+        self.__heartbeat = heartbeat
+        self.__heartbeat_job = None
+        self.__clients = []
+        self.__last_id = 0
+        self.__lock = threading.Lock()
+
+        event_handler.register_fire_listener(self.event_fired)
+
+    def destroy(self):
+        logger.debug("destroy")
+        self.__event_handler.unregister_fire_listener(self.event_fired)
+        with self.__lock:
+            for client in self.__clients: client.close()
+            self.__clients = []
+            self.__scheduler.cancel_job(self.__heartbeat_job)
+            self.__heartbeat_job = None
+
+    def subscribe(self):
+        with self.__lock:
+            if len(self.__clients) >= self.__max_clients:
+                logger.warning('already %s clients subscribed - reject new client', len(self.__clients))
+                return None
+            client = EventStreamClient(self.__buffer_size)
+            self.__clients = self.__clients + [client]
+            if self.__heartbeat_job is None:
+                self.__heartbeat_job = self.__scheduler.add_job_in(
+                    seconds = self.__heartbeat,
+                    callback = self.heartbeat,
+                    name = 'event stream heartbeat',
+                    next_timestamp = lambda last_timestamp: max(last_timestamp, time.time()) + self.__heartbeat
+                )
+            logger.info('client subscribed to event stream (%s clients)', len(self.__clients))
+            return client
+
+    def unsubscribe(self, client):
+        with self.__lock:
+            if client not in self.__clients: return
+            self.__clients = [other for other in self.__clients if other is not client]
+            if not self.__clients:
+                self.__scheduler.cancel_job(self.__heartbeat_job)
+                self.__heartbeat_job = None
+            logger.info('client unsubscribed from event stream (%s clients)', len(self.__clients))
+
+    def publish(self, message):
+        # the list is replaced (never changed) on subscribe, so it can be read without lock
+        for client in self.__clients: client.put(message)
+
+    def heartbeat(self):
+        self.publish(': heartbeat\n\n')
+
+    def event_fired(self, event_name, event_source, kwargs):
+        if not self.__clients: return
+        with self.__lock:
+            self.__last_id += 1
+            event_id = self.__last_id
+        data = json.dumps({
+            'name': event_name,
+            'source': event_source,
+            'time': time.time(),
+            'kwargs': kwargs or {}
+        }, default = str)
+        self.publish('id: %s\nevent: %s\ndata: %s\n\n' % (event_id, event_name, data))
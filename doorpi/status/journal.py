@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import threading
+import json
+import time
+from fnmatch import fnmatchcase # used by: EventJournal.excluded
+
+from action.event_patterns import is_pattern, pattern_of, PATTERN_PREFIX
+
+try: import sqlite3
+except ImportError: sqlite3 = None
+
+import doorpi
+from status.metrics import metrics
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    event_name TEXT NOT NULL,
+    source TEXT,
+    kwargs TEXT,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_event_name_timestamp ON events (event_name, timestamp);
+CREATE INDEX IF NOT EXISTS events_source_timestamp ON events (source, timestamp);
+CREATE TABLE IF NOT EXISTS actions (
+    event_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    failed INTEGER NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS actions_event_id ON actions (event_id);
+'''
+CLEANUP_INTERVAL = 3600
+# rows fetched from sqlite at once while a query result is streamed
+FETCH_SIZE = 100
+TIME_FORMATS = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+def load_journal():
+    config = doorpi.DoorPi().config
+    if not config.get_boolean('Journal', 'enabled', True): return None
+    if sqlite3 is None:
+        logger.warning('sqlite3 not available - event journal disabled')
+        return None
+    journal = EventJournal(
+        filename = config.get('Journal', 'filename', '/var/lib/doorpi/journal.sqlite'),
+        event_handler = doorpi.DoorPi().event_handler,
+        scheduler = doorpi.DoorPi().scheduler,
+        commit_interval = config.get_int('Journal', 'commit_interval', 5),
+        batch_size = config.get_int('Journal', 'batch_size', 100),
+        retention_days = config.get_int('Journal', 'retention_days', 90),
+        exclude = config.get_list('Journal', 'exclude', [PATTERN_PREFIX + 'OnTime*'])
+    )
+    if not journal.start(): return None
+    return journal
+
+def to_unicode(value):
+    if value is None: return None
+    if not isinstance(value, basestring): value = str(value)
+    if isinstance(value, str): return value.decode('utf-8', 'replace')
+    return value
+
+def parse_time(value):
+    """ unix timestamp or local time like 2015-06-02 14:00 """
+    try: return float(value)
+    except ValueError: pass
+    for time_format in TIME_FORMATS:
+        try: return time.mktime(time.strptime(value, time_format))
+        except ValueError: continue
+    raise ValueError('time %s has to be a timestamp or one of %s' % (value, TIME_FORMATS))
+
+def encode_cursor(event):
+    return '%r_%s' % (event['timestamp'], event['id'])
+
+def decode_cursor(cursor):
+    timestamp, separator, event_id = cursor.partition('_')
+    return float(timestamp), int(event_id)
+
+class EventJournal(object):
+    """ append-only SQLite journal of all fired events and the results of their actions
+
+    The EventHandler only appends finished events to a list. A background
+    writer commits them in one transaction every commit_interval seconds
+    (or batch_size events), so the SD card does not see one write per
+    event. WAL with synchronous=NORMAL only syncs at checkpoints.
+    Entries older than retention_days are deleted once an hour.
+    """
+
+    @property
+    def filename(self): return self.__filename
+
+    @property
+    def status(self):
+        return {
+            'filename': self.__filename,
+            'pending': len(self.__pending),
+            'retention_days': self.__retention_days,
+            'exclude': self.__exclude
+        }
+
+    def __init__(self, filename, event_handler, scheduler, commit_interval = 5, batch_size = 100, retention_days = 90, exclude = ()):
+        logger.debug("__init__ (%s)", filename)
+        self.__filename = filename
+        self.__event_handler = event_handler
+        self.__scheduler = scheduler
+        self.__commit_interval = commit_interval
+        self.__batch_size = batch_size
+        self.__retention_days = retention_days
+        self.__exclude = list(exclude)
+        self.__excluded = {} # event_name -> bool
+        self.__pending = []
+        self.__condition = threading.Condition()
+        self.__flush_job = None
+        self.__flush_requested = False
+        self.__destroy = False
+        self.__last_cleanup = 0
+        self.__thread = None
+
+    def start(self):
+        try:
+            directory = os.path.dirname(self.__filename)
+            if directory and not os.path.isdir(directory): os.makedirs(directory)
+            self.connect().close()
+        except (OSError, sqlite3.Error) as ex:
+            logger.warning('event journal %s not usable (%s) - disabled', self.__filename, ex)
+            return False
+        self.__thread = threading.Thread(target = self.run, name = 'event journal')
+        self.__thread.daemon = True
+        self.__thread.start()
+        self.__event_handler.register_finish_listener(self.event_finished)
+        logger.info('event journal at %s', self.__filename)
+        return True
+
+    def destroy(self):
+        """ writes all pending entries """
+        logger.debug("destroy")
+        self.__event_handler.unregister_finish_listener(self.event_finished)
+        with self.__condition:
+            self.__destroy = True
+            self.__scheduler.cancel_job(self.__flush_job)
+            self.__condition.notify()
+        if self.__thread is not None: self.__thread.join(5)
+        self.__thread = None
+
+    def connect(self):
+        connection = sqlite3.connect(self.__filename)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def excluded(self, event_name):
+        excluded = self.__excluded.get(event_name)
+        if excluded is None:
+            # ~OnTime* is a pattern, every other name is literal - as for the actions
+            excluded = self.__excluded[event_name] = any(
+                fnmatchcase(event_name, pattern_of(exclude)) if is_pattern(exclude) else event_name == exclude
+                for exclude in self.__exclude
+            )
+        return excluded
+
+    def event_finished(self, record, results):
+        if self.excluded(record.event_name): return
+        with self.__condition:
+            self.__pending.append((record, results))
+            if len(self.__pending) >= self.__batch_size:
+                self.__condition.notify()
+            elif self.__flush_job is None:
+                self.__flush_job = self.__scheduler.add_job_in(self.__commit_interval, self.flush, name = 'event journal')
+
+    def flush(self):
+        with self.__condition:
+            self.__flush_requested = True
+            self.__condition.notify()
+
+    def run(self):
+        connection = self.connect()
+        while True:
+            with self.__condition:
+                # no timeout - python 2 would poll, the flush job of the scheduler wakes this thread up
+                while not self.__flush_requested and not self.__destroy and len(self.__pending) < self.__batch_size:
+                    self.__condition.wait()
+                entries = self.__pending
+                self.__pending = []
+                self.__flush_requested = False
+                self.__scheduler.cancel_job(self.__flush_job)
+                self.__flush_job = None
+                destroy = self.__destroy
+
+            if entries: self.write(connection, entries)
+            if time.time() - self.__last_cleanup > CLEANUP_INTERVAL: self.cleanup(connection)
+            if destroy: break
+        connection.close()
+
+    def write(self, connection, entries):
+        try:
+            with connection:
+                for record, results in entries:
+                    event_id = connection.execute(
+                        'INSERT INTO events (timestamp, event_name, source, kwargs, finished) VALUES (?, ?, ?, ?, ?)', (
+                            record.timestamp,
+                            to_unicode(record.event_name),
+                            to_unicode(record.source),
+                            to_unicode(json.dumps(record.kwargs, default = str)) if record.kwargs else None,
+                            record.finished
+                        )
+                    ).lastrowid
+                    if not results: continue
+                    connection.executemany(
+                        'INSERT INTO actions (event_id, action, failed, duration) VALUES (?, ?, ?, ?)',
+                        [(event_id, to_unicode(action_name), int(failed), duration) for action_name, failed, duration in results]
+                    )
+        except sqlite3.Error:
+            logger.exception('could not write %s entries to the event journal', len(entries))
+            metrics.increment('doorpi_journal_errors')
+            return False
+        metrics.increment('doorpi_journal_written', value = len(entries))
+        logger.trace('wrote %s entries to the event journal', len(entries))
+        return True
+
+    def query(self, start = None, end = None, event_name = None, source = None, cursor = None,
+              limit = 100, descending = False, with_actions = True):
+        """ generator of events (dicts) ordered by time - only FETCH_SIZE rows are in memory at once
+
+        event_name may be a pattern (~OnKeyPressed_*). cursor continues
+        after the event it was built from (encode_cursor). Every query
+        uses its own connection - WAL lets it read while the writer writes.
+        """
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            parameters.append(start)
+        if end is not None:
+            conditions.append('timestamp < ?')
+            parameters.append(end)
+        if event_name and is_pattern(event_name):
+            conditions.append('event_name GLOB ?')
+            parameters.append(to_unicode(pattern_of(event_name)))
+        elif event_name:
+            conditions.append('event_name = ?')
+            parameters.append(to_unicode(event_name))
+        if source:
+            conditions.append('source = ?')
+            parameters.append(to_unicode(source))
+        if cursor:
+            timestamp, event_id = decode_cursor(cursor)
+            conditions.append('(timestamp %s ? OR (timestamp = ? AND id %s ?))' % (('<', '<') if descending else ('>', '>')))
+            parameters.extend([timestamp, timestamp, event_id])
+        order = 'DESC' if descending else 'ASC'
+        sql = 'SELECT id, timestamp, event_name, source, kwargs, finished FROM events'
+        if conditions: sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY timestamp %s, id %s LIMIT ?' % (order, order)
+        parameters.append(limit)
+
+        connection = sqlite3.connect(self.__filename)
+        try:
+            rows = connection.execute(sql, parameters)
+            while True:
+                chunk = rows.fetchmany(FETCH_SIZE)
+                if not chunk: break
+                actions = self.query_actions(connection, [row[0] for row in chunk]) if with_actions else {}
+                for event_id, timestamp, name, event_source, kwargs, finished in chunk:
+                    event = {
+                        'id': event_id,
+                        'timestamp': timestamp,
+                        'event_name': name,
+                        'source': event_source,
+                        'kwargs': json.loads(kwargs) if kwargs else None,
+                        'finished': finished
+                    }
+                    if with_actions: event['actions'] = actions.get(event_id, [])
+                    yield event
+        finally:
+            connection.close()
+
+    def query_actions(self, connection, event_ids):
+        actions = {}
+        rows = connection.execute(
+            'SELECT event_id, action, failed, duration FROM actions WHERE event_id IN (%s) ORDER BY rowid' % ','.join('?' * len(event_ids)),
+            event_ids
+        )
+        for event_id, action, failed, duration in rows:
+            actions.setdefault(event_id, []).append({'action': action, 'failed': bool(failed), 'duration': duration})
+        return actions
+
+    def cleanup(self, connection):
+        self.__last_cleanup = time.time()
+        if self.__retention_days <= 0: return
+        oldest = time.time() - self.__retention_days * 86400
+        try:
+            with connection:
+                connection.execute('DELETE FROM actions WHERE event_id IN (SELECT id FROM events WHERE timestamp < ?)', (oldest,))
+                deleted = connection.execute('DELETE FROM events WHERE timestamp < ?', (oldest,)).rowcount
+        except sqlite3.Error:
+            logger.exception('could not delete old entries of the event journal')
+            return
+        if deleted: logger.info('deleted %s events older than %s days from the event journal', deleted, self.__retention_days)
+
+metrics.describe('doorpi_journal_written', 'counter', 'events written to the event journal')
+metrics.describe('doorpi_journal_errors', 'counter', 'failed writes to the event journal')
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import math # used by: Histogram.bucket_index
+import threading
+
+# buckets: every power of two is split into SUB_BUCKETS linear parts (HDR style),
+# smallest value is 1 microsecond, everything above 2^MAX_EXPONENT microseconds (~1h) lands in the last one
+SUB_BUCKETS = 4
+MAX_EXPONENT = 32
+PERCENTILES = [50, 90, 99]
+
+class Histogram(object):
+    """ fixed memory histogram for durations in seconds """
+
+    __slots__ = ('buckets', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (MAX_EXPONENT * SUB_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket_index(value):
+        microseconds = value * 1000000
+        if microseconds < 1: return 0
+        mantissa, exponent = math.frexp(microseconds) # 0.5 <= mantissa < 1
+        index = (exponent - 1) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        return min(index, MAX_EXPONENT * SUB_BUCKETS)
+
+    @staticmethod
+    def bucket_upper_bound(index):
+        exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub_bucket + 1) / (2.0 * SUB_BUCKETS), exponent + 1) / 1000000
+
+    def record(self, value):
+        self.buckets[self.bucket_index(value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def percentile(self, percent):
+        if not self.count: return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank: return min(self.bucket_upper_bound(index), self.max)
+        return self.max
+
+    @property
+    def status(self):
+        status = {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else None,
+            'buckets': {}
+        }
+        for percent in PERCENTILES:
+            status['p%s' % percent] = self.percentile(percent)
+        for index, bucket in enumerate(self.buckets):
+            if bucket: status['buckets']['%.6f' % self.bucket_upper_bound(index)] = bucket
+        return status
+
+class TimingStatistic(object):
+
+    __slots__ = ('count', 'errors', 'execution_time', 'queue_delay')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.execution_time = Histogram()
+        self.queue_delay = Histogram()
+
+    @property
+    def status(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'execution_time': self.execution_time.status,
+            'queue_delay': self.queue_delay.status
+        }
+
+class Metrics(object):
+    """ counts and timings of fired events and actions
+
+    All record_* calls are guarded by 'if metrics.enabled' at the caller,
+    so a disabled instance costs one attribute lookup per event.
+    Counters (increment) are always maintained - they are plain integer
+    additions and feed the OpenMetrics output. Collectors are callbacks
+    for values that already exist somewhere else (e.g. call state) and
+    are only called while rendering.
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__events = {}
+        self.__actions = {}
+        self.__families = {} # name -> (type, help)
+        self.__counters = {} # name -> {labels: value}
+        self.__collectors = {} # name -> callback
+
+    def describe(self, name, type, help):
+        self.__families[name] = (type, help)
+
+    def increment(self, name, labels = (), value = 1):
+        with self.__lock:
+            values = self.__counters.get(name)
+            if values is None: values = self.__counters[name] = {}
+            values[labels] = values.get(labels, 0) + value
+
+    def register_collector(self, name, type, help, callback):
+        """ callback returns a value or a list of (labels, value) """
+        self.describe(name, type, help)
+        self.__collectors[name] = callback
+
+    def unregister_collector(self, name):
+        self.__collectors.pop(name, None)
+
+    @property
+    def families(self):
+        """ returns [(name, type, help, [(labels, value)])] """
+        with self.__lock:
+            counters = dict((name, list(values.items())) for name, values in self.__counters.items())
+        families = []
+        for name in sorted(self.__families):
+            type, help = self.__families[name]
+            if name in counters:
+                samples = counters[name]
+            elif name in self.__collectors:
+                try: samples = self.__collectors[name]()
+                except:
+                    logger.exception('error while collecting metric %s', name)
+                    continue
+                if samples is None: continue
+                if not isinstance(samples, list): samples = [((), samples)]
+            else:
+                continue
+            families.append((name, type, help, samples))
+        return families
+
+    def configure(self, config):
+        self.enabled = config.get_boolean('Metrics', 'enabled', False)
+        logger.debug('metrics are %s', 'enabled' if self.enabled else 'disabled')
+
+    def statistic(self, statistics, name):
+        statistic = statistics.get(name)
+        if statistic is None:
+            with self.__lock:
+                statistic = statistics.setdefault(name, TimingStatistic())
+        return statistic
+
+    def record_queue_delay(self, event_name, delay):
+        self.statistic(self.__events, event_name).queue_delay.record(delay)
+
+    def record_event(self, event_name, duration, failed = False):
+        statistic = self.statistic(self.__events, event_name)
+        statistic.count += 1
+        if failed: statistic.errors += 1
+        statistic.execution_time.record(duration)
+
+    def record_action(self, action_name, duration, failed = False):
+        statistic = self.statistic(self.__actions, action_name)
+        statistic.count += 1
+        if failed: statistic.errors += 1
+        statistic.execution_time.record(duration)
+
+    def reset(self):
+        with self.__lock:
+            self.__events = {}
+            self.__actions = {}
+            self.__counters = {}
+
+    @property
+    def timings(self):
+        return list(self.__events.items()), list(self.__actions.items())
+
+    @property
+    def status(self):
+        status = {'enabled': self.enabled, 'events': {}, 'actions': {}}
+        for name, statistic in list(self.__events.items()):
+            status['events'][name] = statistic.status
+        for name, statistic in list(self.__actions.items()):
+            status['actions'][name] = statistic.status
+        return status
+
+metrics = Metrics()
+metrics.describe('doorpi_events_fired', 'counter', 'fired events with registered source')
+metrics.describe('doorpi_actions_run', 'counter', 'actions run by fired events')
+metrics.describe('doorpi_actions_failed', 'counter', 'actions that raised an exception')
+metrics.register_collector('doorpi_threads', 'gauge', 'active python threads', threading.active_count)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+QUANTILES = [50, 90, 99]
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(labels):
+    if not labels: return ''
+    return '{' + ','.join(['%s="%s"' % (name, escape(value)) for name, value in labels]) + '}'
+
+def format_value(value):
+    if value is None: return 'NaN'
+    if value is True: return '1'
+    if value is False: return '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_family(lines, name, type, help, samples):
+    lines.append('# TYPE %s %s' % (name, type))
+    lines.append('# HELP %s %s' % (name, escape(help)))
+    suffix = '_total' if type == 'counter' else ''
+    for labels, value in sorted(samples):
+        lines.append('%s%s%s %s' % (name, suffix, format_labels(labels), format_value(value)))
+
+def render_timings(lines, name, help, label_name, statistics):
+    if not statistics: return
+    lines.append('# TYPE %s summary' % name)
+    lines.append('# HELP %s %s' % (name, escape(help)))
+    for key, statistic in sorted(statistics):
+        histogram = statistic.execution_time
+        for quantile in QUANTILES:
+            lines.append('%s%s %s' % (
+                name,
+                format_labels(((label_name, key), ('quantile', quantile / 100.0))),
+                format_value(histogram.percentile(quantile))
+            ))
+        lines.append('%s_sum%s %s' % (name, format_labels(((label_name, key),)), format_value(histogram.sum)))
+        lines.append('%s_count%s %s' % (name, format_labels(((label_name, key),)), format_value(histogram.count)))
+
+def render(metrics):
+    lines = []
+    for name, type, help, samples in metrics.families:
+        render_family(lines, name, type, help, samples)
+    if metrics.enabled:
+        events, actions = metrics.timings
+        render_timings(lines, 'doorpi_event_duration_seconds', 'execution time of all actions of an event', 'event', events)
+        render_timings(lines, 'doorpi_action_duration_seconds', 'execution time of one action', 'action', actions)
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
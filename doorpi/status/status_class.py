@@ -6,43 +6,148 @@ logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
 import json
+import time # used by: DoorPiStatus.__init__ (etag prefix)
+import threading
 from datetime import datetime
 
+from status.metrics import metrics
+from action.event_patterns import PATTERN_PREFIX
+
+SECTIONS = ['additional_informations', 'configfile', 'keyboard', 'sipphone',
+            'event_handler', 'action_types', 'metrics', 'scheduler']
+# sections touched by every fired event - the others only by matching events (see event_fired)
+EVENT_SECTIONS = ['additional_informations', 'event_handler', 'metrics', 'scheduler']
+
 class DoorPiStatus(object):
+    """ versioned status snapshot
+
+    Sections are only collected again after they were invalidated - by a
+    fired event, a registered action or a new config. The version grows
+    with every invalidation, so it works as ETag and as starting point
+    for deltas (only sections changed since a version).
+    Codecs, sound devices and the config are static and collected once.
+    """
 
-    __status = {}
     @property
-    def dictionary(self): return self.__status
+    def version(self): return self.__version
 
     @property
-    def json(self): return json.dumps(self.__status)
+    def etag(self): return self.etag_of(self.__version)
 
     @property
-    def json_beautified(self): return json.dumps(self.__status, sort_keys=True, indent=4)
+    def dictionary(self): return self.snapshot()
 
-    def __init__(self, DoorPiObject):
-        self.collect_status(DoorPiObject)
+    @property
+    def json(self): return self.serialized(False)[1]
 
-    def collect_status(self, DoorPiObject):
-        self.__status['status_time'] = str(datetime.now())
-        self.__status['additional_informations'] = DoorPiObject.additional_informations
-        self.__status['configfile'] = self.collect_status_from_config(DoorPiObject.config)
-        self.__status['keyboard'] = self.collect_status_from_keyboard(DoorPiObject.keyboard)
-        self.__status['sipphone'] = self.collect_status_from_sipphone(DoorPiObject.sipphone)
-        self.__status['event_handler'] = self.collect_status_from_event_handler(DoorPiObject.event_handler)
+    @property
+    def json_beautified(self): return self.serialized(True)[1]
+
+    def __init__(self, DoorPiObject):
+        self.__doorpi = DoorPiObject
+        self.__lock = threading.RLock()
+        self.__instance_id = '%x' % int(time.time())
+        self.__version = 1
+        self.__section_versions = dict((section, self.__version) for section in SECTIONS)
+        self.__collected_versions = {}
+        self.__sections = {}
+        self.__static = {}
+        self.__serialized = {}
+        self.__status_time = None
+
+        DoorPiObject.event_handler.register_fire_listener(self.event_fired)
+        DoorPiObject.event_handler.register_action_listener(self.action_registered)
+
+    def etag_of(self, version): return '"%s-%s"' % (self.__instance_id, version)
+
+    def invalidate(self, *sections):
+        with self.__lock:
+            self.__version += 1
+            for section in sections: self.__section_versions[section] = self.__version
+
+    def invalidate_static(self):
+        with self.__lock:
+            self.__static = {}
+            self.invalidate('configfile', 'sipphone', 'action_types')
+
+    def event_fired(self, event_name, event_source, kwargs):
+        sections = list(EVENT_SECTIONS)
+        if event_name.startswith('OnKey'): sections.append('keyboard')
+        if 'Call' in event_name or event_name.startswith('OnSipPhone'): sections.append('sipphone')
+        self.invalidate(*sections)
+
+    def action_registered(self, event_name):
+        self.invalidate('event_handler')
+
+    def collect_section(self, section):
+        DoorPiObject = self.__doorpi
+        if section == 'additional_informations': return DoorPiObject.additional_informations
+        if section == 'configfile': return self.static('configfile', lambda: self.collect_status_from_config(DoorPiObject.config))
+        if section == 'keyboard': return self.collect_status_from_keyboard(DoorPiObject.keyboard)
+        if section == 'sipphone': return self.collect_status_from_sipphone(DoorPiObject.sipphone)
+        if section == 'event_handler': return self.collect_status_from_event_handler(DoorPiObject.event_handler)
+        if section == 'action_types': return self.static('action_types', lambda: DoorPiObject.action_registry.status)
+        if section == 'metrics': return metrics.status
+        if section == 'scheduler': return self.collect_status_from_scheduler(DoorPiObject.scheduler, DoorPiObject.time_events)
+
+    def static(self, name, collect):
+        if name not in self.__static: self.__static[name] = collect()
+        return self.__static[name]
+
+    def snapshot(self, since = 0):
+        with self.__lock:
+            for section in SECTIONS:
+                if self.__collected_versions.get(section, 0) >= self.__section_versions[section]: continue
+                self.__sections[section] = self.collect_section(section)
+                self.__collected_versions[section] = self.__version
+                self.__status_time = str(datetime.now())
+
+            status = {'status_time': self.__status_time, 'version': self.__version}
+            for section in SECTIONS:
+                if self.__section_versions[section] > since: status[section] = self.__sections[section]
+            return status
+
+    def serialized(self, beautified = False, since = 0):
+        """ (version, json) - the version is the one of the body, for the ETag """
+        with self.__lock:
+            key = (self.__version, beautified, since)
+            if key not in self.__serialized:
+                status = self.snapshot(since)
+                if beautified: body = json.dumps(status, sort_keys=True, indent=4)
+                else: body = json.dumps(status)
+                self.__serialized = {key: (status['version'], body)}
+            return self.__serialized[key]
+
+    def collect_status_from_scheduler(self, scheduler, time_events):
+        status = {}
+        if scheduler is None: return status
+        status['jobs'] = scheduler.jobs
+        if time_events is not None: status['time_events'] = time_events.granularities
+        return status
 
     def collect_status_from_event_handler(self, event_handler):
         status = {}
-        status['sources'] = event_handler.sources
-        status['events'] = event_handler.events
-        status['events_by_source'] = event_handler.events_by_source
+        status['sources'] = sorted(event_handler.sources)
+
+        status['events'] = {}
+        for event in event_handler.events:
+            status['events'][event] = sorted(event_handler.events[event])
+
+        status['events_by_source'] = {}
+        for source in event_handler.events_by_source:
+            status['events_by_source'][source] = sorted(event_handler.events_by_source[source])
 
         status['actions'] = {}
         for event in event_handler.actions:
             status['actions'][event] = []
             for action in event_handler.actions[event]:
                 status['actions'][event].append(str(action))
+        for pattern in event_handler.action_patterns:
+            status['actions'][PATTERN_PREFIX + pattern] = [str(action) for action in event_handler.action_patterns[pattern]]
+        for pattern in event_handler.event_patterns:
+            status['events'][PATTERN_PREFIX + pattern] = sorted(event_handler.event_patterns[pattern])
 
+        status['dispatcher'] = event_handler.dispatcher.status
         status['threads'] = str(event_handler.threads)
         status['idle'] = str(event_handler.idle)
         return status
@@ -53,14 +158,31 @@ class DoorPiStatus(object):
         return status
 
     def collect_status_from_sipphone(self, sipphone):
-        if sipphone.name is 'pjsua': return self.collect_status_from_sipphone_pjsua(sipphone)
+        if sipphone is not None and sipphone.name is 'pjsua': return self.collect_status_from_sipphone_pjsua(sipphone)
         else: return {'sipphone': 'not detected'}
 
     def collect_status_from_sipphone_pjsua(self, sipphone):
         status = {}
+        # called by the threads of the webservice - pjsua has to know them
+        if not sipphone.register_thread(): return {'sipphone': 'not started'}
 
         status['parsed_recorder_filename'] = sipphone.parsed_recorder_filename
 
+        status['codecs'] = self.static('codecs', lambda: self.collect_codecs_from_pjsua(sipphone))
+        status['sounddevices'] = self.static('sounddevices', lambda: self.collect_sounddevices_from_pjsua(sipphone))
+
+        if sipphone.current_call is not None:
+            status['current_call'] = sipphone.current_call.dump_status().split('\n')
+            status['level_incoming'] = sipphone.lib.conf_get_signal_level(0)[0] # tx_level
+            status['level_outgoing'] = sipphone.lib.conf_get_signal_level(0)[1] # rx_level
+        else:
+            status['current_call'] = None
+            status['level_incoming'] = None
+            status['level_outgoing'] = None
+
+        return status
+
+    def collect_codecs_from_pjsua(self, sipphone):
         codecs = {}
         for codec in sipphone.lib.enum_codecs():
             codecs[codec.name] = {
@@ -74,8 +196,9 @@ class DoorPiStatus(object):
                 'ptime': codec.ptime,
                 'vad_enabled': codec.vad_enabled
             }
-        status['codecs'] = codecs
+        return codecs
 
+    def collect_sounddevices_from_pjsua(self, sipphone):
         sounddevices = {}
         for sounddevice in sipphone.lib.enum_snd_dev():
             sounddevices[sounddevice.name] = {
@@ -83,27 +206,19 @@ class DoorPiStatus(object):
                 'input_channels': sounddevice.input_channels,
                 'output_channels': sounddevice.output_channels
             }
-        status['sounddevices'] = sounddevices
-
-        if sipphone.current_call is not None:
-            status['current_call'] = sipphone.current_call.dump_status().split('\n')
-            status['level_incoming'] = sipphone.lib.conf_get_signal_level(0)[0] # tx_level
-            status['level_outgoing'] = sipphone.lib.conf_get_signal_level(0)[1] # rx_level
-        else:
-            status['current_call'] = None
-            status['level_incoming'] = None
-            status['level_outgoing'] = None
-
-        return status
+        return sounddevices
 
     def collect_status_from_keyboard(self, keyboard):
         status = {}
         status['name'] = keyboard.name
 
+        # one read of the whole input port
+        mask = keyboard.input_mask()
         inputpins = {}
         for input_pin in keyboard.input_pins:
-            inputpins[input_pin] = keyboard.status_inputpin(input_pin)
+            inputpins[input_pin] = bool(mask >> input_pin & 1)
         status['inputpins'] = inputpins
+        status['input_mask'] = mask
 
         #TODO: Status vom Output abfragen und übersichtlich darstellen als dict
         #outputpins = {}
@@ -9,75 +9,299 @@ import os.path
 import urlparse
 
 import BaseHTTPServer
+import SocketServer
+import Queue
+import threading
+import socket # used by: WebService.get_events
 import cgi
+import json
 
 import doorpi
-from action.base import SingleAction
+from status.metrics import metrics
+import status.openmetrics
+from status.journal import parse_time, encode_cursor
 
-def run_webservice(ip = '', port = 8080):
-    logger.debug('starting webservice')
-    server_address = (ip, port)
-    httpd = BaseHTTPServer.HTTPServer(server_address, WebService)
+def load_webservice():
+    config = doorpi.DoorPi().config
+    return WebServer(
+        server_address = (config.get('Webservice', 'ip', ''), config.get_int('Webservice', 'port', 8080)),
+        workers = config.get_int('Webservice', 'workers', 8),
+        timeout = config.get_int('Webservice', 'timeout', 15),
+        keep_alive = config.get_boolean('Webservice', 'keep_alive', True)
+    )
 
-    doorpi.DoorPi().event_handler.register_action('OnTimeMinute', SingleAction(httpd.shutdown))
-    doorpi.DoorPi().event_handler.register_action('OnShutdown', SingleAction(httpd.shutdown))
+MAX_JOURNAL_LIMIT = 1000
+# bytes collected before a chunk of a streamed response is written
+STREAM_BUFFER_SIZE = 8192
 
-    while doorpi.DoorPi().shutdown is False:
-        logger.debug('waiting for next request')
-        httpd.handle_request()
-    return
+def parse_limit(value):
+    # checked before the first row - after the header a 400 is not possible any more
+    limit = int(value)
+    if limit < 1: raise ValueError('limit has to be at least 1')
+    return min(limit, MAX_JOURNAL_LIMIT)
+
+class ThreadPoolMixIn(SocketServer.ThreadingMixIn):
+    """ like ThreadingMixIn, but with a fixed number of worker threads
+
+    Accepted connections wait in a queue until a worker is free, so a
+    slow client only blocks its own worker and not the whole server.
+    """
+
+    workers = 8
+
+    def start_workers(self):
+        self.__requests = Queue.Queue()
+        self.__workers = []
+        for number in range(self.workers):
+            worker = threading.Thread(target = self.process_request_worker, name = 'webservice worker %s' % number)
+            worker.daemon = True
+            worker.start()
+            self.__workers.append(worker)
+
+    def stop_workers(self):
+        for worker in self.__workers: self.__requests.put(None)
+        self.__workers = []
+
+    def process_request_worker(self):
+        while True:
+            request = self.__requests.get()
+            if request is None: return
+            self.process_request_thread(*request)
+
+    def process_request(self, request, client_address):
+        self.__requests.put((request, client_address))
+
+class WebServer(ThreadPoolMixIn, BaseHTTPServer.HTTPServer):
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, workers = 8, timeout = 15, keep_alive = True):
+        logger.debug("__init__ (%s:%s)", server_address[0], server_address[1])
+        self.workers = workers
+        self.request_timeout = timeout
+        self.keep_alive = keep_alive
+        self.__thread = None
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, WebService)
+
+    def start(self):
+        logger.info('starting webservice at %s:%s', self.server_address[0], self.server_address[1])
+        self.start_workers()
+        self.__thread = threading.Thread(target = self.serve_forever, name = 'webservice')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def destroy(self):
+        logger.debug("destroy")
+        if self.__thread is None: return
+        self.shutdown()
+        self.server_close()
+        self.stop_workers()
+        self.__thread = None
 
 class WebService(BaseHTTPServer.BaseHTTPRequestHandler):
 
-    ip = ''
-    port = 8080
+    # path -> name of the handler method, HEAD uses the GET routes without body
+    routes = {
+        'GET': {
+            '/': 'get_status',
+            '/status': 'get_status',
+            '/metrics': 'get_metrics',
+            '/metrics.json': 'get_metrics_json',
+            '/events': 'get_events',
+            '/history': 'get_history',
+            '/journal': 'get_journal'
+        },
+        'POST': {
+            '/reload': 'post_reload'
+        }
+    }
+
+    def setup(self):
+        self.timeout = self.server.request_timeout
+        if self.server.keep_alive: self.protocol_version = 'HTTP/1.1'
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.client_address[0], format % args)
+
+    def do_HEAD(self): self.route('GET', head_only = True)
+    def do_GET(self): self.route('GET')
+    def do_POST(self): self.route('POST')
+
+    def end_headers(self):
+        self.headers_sent = True
+        BaseHTTPServer.BaseHTTPRequestHandler.end_headers(self)
 
-    @staticmethod
-    def run_webserver():
-        logger.debug('starting webservice')
-        server_address = (WebService.ip, WebService.port)
-        print "server_address: %s %s" % (server_address)
-        httpd = BaseHTTPServer.HTTPServer(server_address, WebService)
-        httpd.serve_forever()
-        return True
+    def route(self, method, head_only = False):
+        self.head_only = head_only
+        self.headers_sent = False
+        self.parsed_path = urlparse.urlparse(self.path)
+        self.query = urlparse.parse_qs(self.parsed_path.query)
+        handler_name = self.routes[method].get(self.parsed_path.path)
+        if handler_name is None:
+            for other_method in self.routes:
+                if self.parsed_path.path in self.routes[other_method]:
+                    return self.send_error(405)
+            return self.send_error(404)
+        try:
+            getattr(self, handler_name)()
+        except Exception:
+            logger.exception('error while handling %s %s', method, self.path)
+            # a status line in the middle of a (chunked) body would break the response - only close it
+            if self.headers_sent: self.close_connection = 1
+            else: self.send_error(500)
 
-    def do_HEAD(self):
-        logger.info('do_HEAD')
+    def get_metrics(self):
+        self.send_content(status.openmetrics.render(metrics), status.openmetrics.CONTENT_TYPE)
+
+    def get_metrics_json(self):
+        self.send_content(json.dumps(metrics.status, sort_keys=True, indent=4))
+
+    def get_status(self):
+        doorpi_status = doorpi.DoorPi().status
+        etag = doorpi_status.etag
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        # ?since=<version> returns only the sections changed after this version
+        try: since = int(self.query.get('since', ['0'])[0])
+        except ValueError: since = 0
+        version, content = doorpi_status.serialized(True, since)
+        self.send_content(content, etag = doorpi_status.etag_of(version))
+
+    def get_history(self):
+        # ?event=<name>&count=<n> newest first, ?since=<timestamp>[&event=<name>] oldest first
+        history = doorpi.DoorPi().event_handler.history
+        event_name = self.query.get('event', [None])[0]
+        try:
+            count = int(self.query.get('count', [history.depth])[0])
+            since = self.query.get('since', [None])[0]
+            if since is not None: since = float(since)
+        except ValueError:
+            return self.send_error(400, 'count and since have to be numbers')
+
+        if since is not None: records = history.since(since, event_name)
+        elif event_name is not None: records = history.last(event_name, count)
+        else: records = history.recent(count)
+        self.send_content(json.dumps([record.dictionary for record in records], default = str, indent = 4))
+
+    def get_journal(self):
+        # ?start=&end= (timestamp or 2015-06-02 14:00), event= (~ for wildcards: ~OnKeyPressed_*), source=, limit=, order=desc,
+        # actions=false, cursor= (value of "next" of the previous page)
+        journal = doorpi.DoorPi().journal
+        if journal is None: return self.send_error(503, 'event journal is disabled')
+
+        parameter = lambda name, default = None: self.query.get(name, [default])[0]
+        try:
+            start = parameter('start')
+            if start is not None: start = parse_time(start)
+            end = parameter('end')
+            if end is not None: end = parse_time(end)
+            limit = parse_limit(parameter('limit', 100))
+            cursor = parameter('cursor')
+            events = journal.query(
+                start = start,
+                end = end,
+                event_name = parameter('event'),
+                source = parameter('source'),
+                cursor = cursor,
+                limit = limit + 1,
+                descending = parameter('order', 'asc') == 'desc',
+                with_actions = parameter('actions', 'true') != 'false'
+            )
+            # first row before the header - invalid cursors fail here with 400 and not in the middle of the stream
+            first_event = next(events, None)
+        except ValueError as ex:
+            return self.send_error(400, str(ex))
+
+        def journal_chunks():
+            yield '{"events": ['
+            count = 0
+            last_event = None
+            event = first_event
+            while event is not None:
+                count += 1
+                if count > limit:
+                    events.close()
+                    break
+                yield (',\n' if last_event is not None else '\n') + json.dumps(event, default = str)
+                last_event = event
+                event = next(events, None)
+            next_cursor = encode_cursor(last_event) if count > limit else None
+            yield '\n], "next": %s}\n' % json.dumps(next_cursor)
+        self.send_chunked(journal_chunks())
+
+    def send_chunked(self, chunks, content_type = "application/json"):
+        """ streams chunks without knowing the length before (HTTP/1.1 chunked, HTTP/1.0 until close) """
+        chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
         self.send_response(200)
-        self.send_header("Content-type", "application/json")
+        self.send_header("Content-type", content_type)
+        if chunked: self.send_header("Transfer-Encoding", "chunked")
+        else: self.send_header("Connection", "close")
         self.end_headers()
+        if self.head_only: return
 
-    def do_GET(self):
-        #self.send_header("Content-type", "application/json")
-        #self.send_response(200)
-        #self.end_headers()
-        self.wfile.write(doorpi.DoorPi().status.json_beautified)
-        return
-    def do_GET_status(self):
-        logger.info('do_GET')
-        parsed_path = urlparse.urlparse(self.path)
-        message_parts = [
-                'CLIENT VALUES:',
-                'client_address=%s (%s)' % (self.client_address,
-                                            self.address_string()),
-                'command=%s' % self.command,
-                'path=%s' % self.path,
-                'real path=%s' % parsed_path.path,
-                'query=%s' % parsed_path.query,
-                'request_version=%s' % self.request_version,
-                '',
-                'SERVER VALUES:',
-                'server_version=%s' % self.server_version,
-                'sys_version=%s' % self.sys_version,
-                'protocol_version=%s' % self.protocol_version,
-                '',
-                'HEADERS RECEIVED:',
-        ]
-        for name, value in sorted(self.headers.items()):
-            message_parts.append('%s=%s' % (name, value.rstrip()))
-        message_parts.append('')
-        message = '\r\n'.join(message_parts)
-        self.send_response(200)
+        buffered, size = [], 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size < STREAM_BUFFER_SIZE: continue
+            self.write_chunk(''.join(buffered), chunked)
+            buffered, size = [], 0
+        if buffered: self.write_chunk(''.join(buffered), chunked)
+        if chunked: self.wfile.write('0\r\n\r\n')
+
+    def write_chunk(self, data, chunked):
+        if chunked: self.wfile.write('%x\r\n%s\r\n' % (len(data), data))
+        else: self.wfile.write(data)
+
+    def get_events(self):
+        event_stream = doorpi.DoorPi().event_stream
+        client = event_stream.subscribe() if event_stream is not None else None
+        if client is None: return self.send_error(503, 'too many event stream clients')
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            # the stream ends with the connection - no keep-alive
+            self.send_header("Connection", "close")
+            self.end_headers()
+            if self.head_only: return
+            self.wfile.write('retry: 1000\n\n')
+
+            dropped = 0
+            while True:
+                messages = client.get()
+                if messages is None: break
+                if client.dropped != dropped:
+                    messages.insert(0, 'event: dropped\ndata: %s\n\n' % (client.dropped - dropped))
+                    dropped = client.dropped
+                self.wfile.write(''.join(messages))
+        except socket.error as ex:
+            logger.debug('event stream client %s disconnected (%s)', self.client_address[0], ex)
+        finally:
+            event_stream.unsubscribe(client)
+
+    def post_reload(self):
+        # reads the configfile given at start again - the request body is ignored
+        length = int(self.headers.get('Content-Length') or 0)
+        if length: self.rfile.read(length)
+        try: result = doorpi.DoorPi().reload_config()
+        except Exception as ex:
+            logger.error('reload of config failed - keep the old one: %s', ex)
+            # not send_error - the message of a ConfigParser error has several lines and would break the status line
+            return self.send_content(json.dumps({'error': 'reload failed: %s' % ex}, indent = 4), code = 400)
+        self.send_content(json.dumps(result, indent = 4))
+
+    def send_content(self, content, content_type = "application/json", etag = None, code = 200):
+        self.send_response(code)
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        if etag is not None: self.send_header("ETag", etag)
         self.end_headers()
-        self.wfile.write(message)
-        return
+        if not self.head_only: self.wfile.write(content)
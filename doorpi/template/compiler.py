@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import re
+import datetime
+
+# !name! - names without whitespace, e.g. !LastKey!, !INFOS!, !OnKeyPressed_11!
+PLACEHOLDER = re.compile(r'!([^!\s]+)!')
+CACHE_SIZE = 256
+
+LITERAL = 0
+TIME = 1
+PLACEHOLDER_NAME = 2
+
+templates = {}
+
+def compile_template(source):
+    template = templates.get(source)
+    if template is None:
+        # config strings are a small, fixed set - only strings built at runtime could flood the cache
+        if len(templates) >= CACHE_SIZE: templates.clear()
+        template = templates[source] = Template(source)
+    return template
+
+class Template(object):
+    """ a string with strftime directives and !name! placeholders, split once into segments
+
+    Literal parts with a '%' are rendered by strftime, all others are
+    copied. Placeholders are looked up in lazy (callables, only called
+    if the template uses them) and then in values. Unknown placeholders
+    stay in the text.
+    """
+
+    __slots__ = ('source', 'segments', 'uses_time')
+
+    def __init__(self, source):
+        self.source = source
+        self.segments = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            self.add_literal(source[position:match.start()])
+            self.segments.append((PLACEHOLDER_NAME, match.group(1)))
+            position = match.end()
+        self.add_literal(source[position:])
+        self.uses_time = any(kind is TIME for kind, text in self.segments)
+
+    def add_literal(self, text):
+        if not text: return
+        self.segments.append((TIME if '%' in text else LITERAL, text))
+
+    def render(self, values, lazy = None, now = None):
+        if self.uses_time and now is None: now = datetime.datetime.now()
+        parts = []
+        for kind, text in self.segments:
+            if kind is LITERAL:
+                parts.append(text)
+            elif kind is TIME:
+                parts.append(now.strftime(text))
+            elif lazy is not None and text in lazy:
+                parts.append(str(lazy[text]()))
+            elif text in values:
+                parts.append(str(values[text]))
+            else:
+                parts.append('!' + text + '!')
+        return ''.join(parts)
@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# run from the doorpi directory: python -m unittest discover -s tests -t .
+
+from log.pipeline import add_trace_level
+add_trace_level()
+
+# loads the modules in the same order as DoorPi itself - some of them import each other
+import doorpi
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import ConfigParser
+import StringIO
+
+from conf.config_object import ConfigObject, ConfigValueError
+
+def config_of(text):
+    config = ConfigParser.ConfigParser()
+    config.readfp(StringIO.StringIO(text))
+    return ConfigObject(config)
+
+class ConfigObjectTest(unittest.TestCase):
+
+    def test_schema_values_are_parsed(self):
+        config = config_of('[SMTP]\nport = 587\nuse_tls = true\n')
+        self.assertEqual(config.get_int('SMTP', 'port', 25), 587)
+        self.assertEqual(config.get_boolean('SMTP', 'use_tls'), True)
+
+    def test_empty_number_uses_default(self):
+        config = config_of('[SMTP]\nport =\n[keyboard]\noutput_tick =\n')
+        self.assertEqual(config.get_int('SMTP', 'port', 25), 25)
+        self.assertEqual(config.get_float('keyboard', 'output_tick', 0.01), 0.01)
+
+    def test_invalid_number(self):
+        self.assertRaises(ConfigValueError, config_of, '[SMTP]\nport = smtp\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import time
+import datetime
+
+from action.cron import CronExpression, CronExpressionError
+
+def timestamp(*args):
+    return time.mktime(datetime.datetime(*args).timetuple())
+
+def next_fire(expression, *args):
+    fire = CronExpression(expression).next_fire(timestamp(*args))
+    return None if fire is None else datetime.datetime.fromtimestamp(fire)
+
+class CronExpressionTest(unittest.TestCase):
+
+    def test_every_minute_is_strictly_after(self):
+        self.assertEqual(next_fire('* * * * *', 2015, 6, 1, 12, 0), datetime.datetime(2015, 6, 1, 12, 1))
+        self.assertEqual(next_fire('* * * * *', 2015, 6, 1, 12, 0, 59), datetime.datetime(2015, 6, 1, 12, 1))
+
+    def test_steps_ranges_and_lists(self):
+        self.assertEqual(next_fire('*/15 * * * *', 2015, 6, 1, 12, 16), datetime.datetime(2015, 6, 1, 12, 30))
+        self.assertEqual(next_fire('0 8-18/2 * * *', 2015, 6, 1, 18, 30), datetime.datetime(2015, 6, 2, 8, 0))
+        self.assertEqual(next_fire('5,35 9 * * *', 2015, 6, 1, 9, 5), datetime.datetime(2015, 6, 1, 9, 35))
+
+    def test_rollover_of_year(self):
+        self.assertEqual(next_fire('@yearly', 2015, 12, 31, 23, 59), datetime.datetime(2016, 1, 1, 0, 0))
+        self.assertEqual(next_fire('0 0 1 jan *', 2015, 6, 1), datetime.datetime(2016, 1, 1, 0, 0))
+
+    def test_weekdays(self):
+        # 2015-06-01 is a monday, sunday is 0 and 7
+        self.assertEqual(next_fire('0 7 * * sat', 2015, 6, 1), datetime.datetime(2015, 6, 6, 7, 0))
+        self.assertEqual(next_fire('0 7 * * 7', 2015, 6, 1), datetime.datetime(2015, 6, 7, 7, 0))
+        self.assertEqual(next_fire('@weekly', 2015, 6, 1), datetime.datetime(2015, 6, 7, 0, 0))
+        self.assertEqual(next_fire('0 7 * * mon-fri', 2015, 6, 5, 8), datetime.datetime(2015, 6, 8, 7, 0))
+
+    def test_day_of_month_or_weekday(self):
+        # both restricted - the 15th or a sunday, whichever comes first
+        self.assertEqual(next_fire('0 0 15 * sun', 2015, 6, 1), datetime.datetime(2015, 6, 7, 0, 0))
+        self.assertEqual(next_fire('0 0 15 * sun', 2015, 6, 8), datetime.datetime(2015, 6, 14, 0, 0))
+        self.assertEqual(next_fire('0 0 15 * sun', 2015, 6, 14, 1), datetime.datetime(2015, 6, 15, 0, 0))
+
+    def test_leap_day_and_never(self):
+        self.assertEqual(next_fire('0 0 29 feb *', 2015, 3, 1), datetime.datetime(2016, 2, 29, 0, 0))
+        self.assertEqual(next_fire('0 0 30 feb *', 2015, 3, 1), None)
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '* 24 * * *', '*/0 * * * *', '* * * foo *', '5-1 * * * *',
+                           '*/x * * * *', '1-a * * * *', '* * * * mon-x', '1,,2 * * * *']:
+            self.assertRaises(CronExpressionError, CronExpression, expression)
+        self.assertEqual(str(CronExpression(' @hourly ')), '@hourly')
+
+if __name__ == '__main__':
+    unittest.main()
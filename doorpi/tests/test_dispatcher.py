@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import time
+
+from action.dispatcher import PoolDispatcher
+
+class PoolDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = PoolDispatcher(workers = 2, queue_size = 2, overflow = 'block')
+
+    def tearDown(self):
+        # workers are daemons - let them finish before the interpreter shuts down
+        deadline = time.time() + 5
+        while not self.dispatcher.idle and time.time() < deadline: time.sleep(0.01)
+        self.dispatcher.destroy()
+
+    def test_slow_event_does_not_block_other_events(self):
+        release, done = threading.Event(), threading.Event()
+        self.dispatcher.dispatch('OnSlow', release.wait, (5,))
+        # same key as the slow job would have been hashed to the same worker before
+        self.dispatcher.dispatch('OnSlow', lambda: None, ())
+        self.dispatcher.dispatch('OnFast', done.set, ())
+        self.assertTrue(done.wait(2))
+        self.assertFalse(self.dispatcher.idle)
+        release.set()
+
+    def test_order_of_one_event(self):
+        fired, finished = [], threading.Event()
+        def append(number):
+            fired.append(number)
+            if len(fired) == 20: finished.set()
+        for number in range(20): self.dispatcher.dispatch('OnKeyPressed', append, (number,))
+        self.assertTrue(finished.wait(2))
+        self.assertEqual(fired, range(20))
+
+    def test_full_queue_from_workers_does_not_wait(self):
+        # every worker fires more events than the queue holds - blocking would wait forever
+        finished = threading.Event()
+        counter = []
+        lock = threading.Lock()
+        def count():
+            with lock:
+                counter.append(1)
+                if len(counter) == 2 * 10: finished.set()
+        def fire_many(key):
+            for i in range(10): self.dispatcher.dispatch(key+str(i), count, ())
+        self.dispatcher.dispatch('first', fire_many, ('first',))
+        self.dispatcher.dispatch('second', fire_many, ('second',))
+        self.assertTrue(finished.wait(5))
+        self.assertTrue(self.dispatcher.status['over_limit'] > 0)
+
+    def test_full_queue_from_worker_keeps_order(self):
+        dispatcher = PoolDispatcher(workers = 1, queue_size = 2, overflow = 'block')
+        fired, finished = [], threading.Event()
+        def append(number):
+            fired.append(number)
+            if len(fired) == 5: finished.set()
+        def fire_chain():
+            # the queue is full after two jobs - the others come from the worker itself
+            for number in range(5): dispatcher.dispatch('OnChain', append, (number,))
+        dispatcher.dispatch('OnStart', fire_chain, ())
+        self.assertTrue(finished.wait(2))
+        self.assertEqual(fired, range(5))
+        dispatcher.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
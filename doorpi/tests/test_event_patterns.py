@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from action.event_patterns import EventPatternTrie, is_pattern, pattern_of
+from action.handler import EventHandler
+
+class EventPatternTrieTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = EventPatternTrie()
+
+    def test_only_marked_names_are_patterns(self):
+        self.assertTrue(is_pattern('~OnCallState*'))
+        self.assertEqual(pattern_of('~OnCallState*'), 'OnCallState*')
+        self.assertFalse(is_pattern('OnCallState*'))
+        self.assertFalse(is_pattern('OnDTMF_"**66*"'))
+
+    def test_match(self):
+        self.trie.add('OnCallState*', 'state')
+        self.trie.add('OnKeyPressed_1?', 'key')
+        self.trie.add('OnKey*', 'any key')
+        self.assertEqual(self.trie.match('OnCallStateConnect'), ['state'])
+        self.assertEqual(sorted(self.trie.match('OnKeyPressed_11')), ['any key', 'key'])
+        self.assertEqual(self.trie.match('OnKeyPressed_1'), ['any key'])
+        self.assertEqual(self.trie.match('OnStartup'), [])
+
+    def test_remove(self):
+        self.trie.add('OnCallState*', 'state')
+        self.assertTrue(self.trie.remove('OnCallState*', 'state'))
+        self.assertFalse(self.trie.remove('OnCallState*', 'state'))
+        self.assertEqual(self.trie.match('OnCallStateConnect'), [])
+        self.assertEqual(len(self.trie), 0)
+
+class DTMFEventNameTest(unittest.TestCase):
+    """ DTMF codes with * are literal event names - one code must never fire the actions of another """
+
+    def setUp(self):
+        self.event_handler = EventHandler()
+        self.action = self.event_handler.register_action('OnDTMF_"**66*"', lambda: None)
+
+    def tearDown(self):
+        self.event_handler.unregister_action('OnDTMF_"**66*"', self.action)
+
+    def test_literal_name(self):
+        self.assertEqual(self.event_handler.action_patterns, {})
+        self.assertEqual(self.event_handler.get_actions('OnDTMF_"**66*"'), [self.action])
+        self.assertEqual(self.event_handler.get_actions('OnDTMF_"**6612*"'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from keyboard.inputs import InputPipeline
+
+class FakeEventHandler(object):
+
+    def __init__(self):
+        self.fired = []
+
+    def register_event(self, event_name, event_source):
+        pass
+
+    def fire_event_asynchron(self, event_name, event_source, kwargs = None):
+        # only the events of the pin - the generic ones are the same
+        if event_name[-1].isdigit(): self.fired.append((event_name, kwargs['timestamp']))
+
+class InputPipelineTest(unittest.TestCase):
+
+    def pipeline(self, **kwargs):
+        self.levels = {11: False}
+        self.event_handler = FakeEventHandler()
+        self.pressed_pins = []
+        pipeline = InputPipeline('test', [11], lambda pin: self.levels[pin], self.event_handler,
+                                 self.pressed_pins.append, **kwargs)
+        # the state machine is driven by hand with own timestamps
+        pipeline.destroy()
+        return pipeline
+
+    def press(self, pipeline, timestamp, duration, bounces = 0):
+        for bounce in range(bounces + 1): pipeline.edge_received(11, timestamp + bounce * 0.001)
+        self.levels[11] = True
+        pipeline.check_deadlines(timestamp + 0.2)
+        pipeline.edge_received(11, timestamp + duration)
+        self.levels[11] = False
+        pipeline.check_deadlines(timestamp + duration + 0.2)
+
+    def events(self):
+        return [event_name for event_name, timestamp in self.event_handler.fired]
+
+    def test_debounce(self):
+        pipeline = self.pipeline(debounce = 50, long_press = 0)
+        pipeline.edge_received(11, 100.0)
+        pipeline.edge_received(11, 100.02)
+        self.levels[11] = True
+        # 50 ms after the last bounce - not after the first one
+        pipeline.check_deadlines(100.06)
+        self.assertEqual(self.events(), [])
+        self.assertEqual(pipeline.next_deadline(), 100.07)
+        pipeline.check_deadlines(100.07)
+        self.assertEqual(self.event_handler.fired, [('OnKeyPressed_11', 100.0)])
+        self.assertEqual(self.pressed_pins, [11])
+        self.assertEqual(pipeline.last_key, 11)
+
+    def test_bounce_back_to_same_level(self):
+        pipeline = self.pipeline(debounce = 50)
+        pipeline.edge_received(11, 100.0)
+        pipeline.check_deadlines(100.1)
+        self.assertEqual(self.events(), [])
+        self.assertEqual(pipeline.next_deadline(), None)
+
+    def test_release_and_long_press(self):
+        pipeline = self.pipeline(debounce = 50, long_press = 2000)
+        self.press(pipeline, 100.0, 1.0)
+        self.assertEqual(self.events(), ['OnKeyPressed_11', 'OnKeyReleased_11'])
+
+        self.event_handler.fired = []
+        pipeline.edge_received(11, 200.0)
+        self.levels[11] = True
+        pipeline.check_deadlines(200.1)
+        self.assertEqual(pipeline.next_deadline(), 202.0)
+        pipeline.check_deadlines(202.0)
+        self.assertEqual(self.event_handler.fired, [('OnKeyPressed_11', 200.0), ('OnKeyLongPressed_11', 200.0)])
+        self.assertEqual(pipeline.next_deadline(), None)
+
+    def test_double_press(self):
+        pipeline = self.pipeline(debounce = 50, long_press = 0, double_press = 500)
+        self.press(pipeline, 100.0, 0.1)
+        self.press(pipeline, 100.4, 0.1)
+        self.press(pipeline, 101.5, 0.1)
+        self.assertEqual(self.events(), [
+            'OnKeyPressed_11', 'OnKeyReleased_11',
+            'OnKeyDoublePressed_11', 'OnKeyReleased_11',
+            'OnKeyPressed_11', 'OnKeyReleased_11'
+        ])
+
+    def test_double_press_disabled(self):
+        pipeline = self.pipeline(debounce = 50, long_press = 0)
+        self.press(pipeline, 100.0, 0.1)
+        self.press(pipeline, 100.4, 0.1)
+        self.assertEqual(self.events().count('OnKeyPressed_11'), 2)
+
+    def test_min_press_interval(self):
+        pipeline = self.pipeline(debounce = 50, long_press = 0, min_press_interval = 5000)
+        self.press(pipeline, 100.0, 0.1)
+        self.press(pipeline, 102.0, 0.1)
+        self.press(pipeline, 105.0, 0.1)
+        self.assertEqual([timestamp for event_name, timestamp in self.event_handler.fired
+                          if event_name == 'OnKeyPressed_11'], [100.0, 105.0])
+        self.assertEqual(pipeline.status['rate_limited'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import shutil
+import os
+
+from action.history import EventRecord
+from status.journal import EventJournal, encode_cursor, decode_cursor, parse_time
+from status.webservice import parse_limit, MAX_JOURNAL_LIMIT
+
+def record(event_name, timestamp, source = 'test'):
+    event_record = EventRecord(event_name, timestamp, source, {'pin': 11})
+    event_record.finished = timestamp + 0.5
+    return event_record
+
+class JournalQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = EventJournal(os.path.join(self.directory, 'journal.sqlite'), None, None)
+        connection = self.journal.connect()
+        # two events at the same time - the cursor has to tell them apart by id
+        self.journal.write(connection, [
+            (record('OnKeyPressed_11', 100.0), [('OutAction', False, 0.1)]),
+            (record('OnKeyPressed_13', 100.0), []),
+            (record('OnDTMF_"**66*"', 101.0), []),
+            (record('OnDTMF_"**6612*"', 102.0), [('OutAction', True, 0.2)])
+        ])
+        connection.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def names(self, **kwargs):
+        return [event['event_name'] for event in self.journal.query(**kwargs)]
+
+    def test_order_and_actions(self):
+        events = list(self.journal.query())
+        self.assertEqual([event['timestamp'] for event in events], [100.0, 100.0, 101.0, 102.0])
+        self.assertEqual(events[0]['actions'], [{'action': 'OutAction', 'failed': False, 'duration': 0.1}])
+        self.assertEqual(events[1]['actions'], [])
+        self.assertEqual(events[0]['kwargs'], {'pin': 11})
+        self.assertNotIn('actions', next(self.journal.query(with_actions = False)))
+
+    def test_cursor_pages(self):
+        for descending in (False, True):
+            pages, cursor = [], None
+            while True:
+                page = list(self.journal.query(cursor = cursor, limit = 2, descending = descending))
+                if not page: break
+                pages.append(page)
+                cursor = encode_cursor(page[-1])
+            ids = [event['id'] for page in pages for event in page]
+            self.assertEqual(len(pages), 2)
+            self.assertEqual(ids, sorted(ids, reverse = descending))
+            self.assertEqual(len(set(ids)), 4)
+
+    def test_cursor_round_trip(self):
+        event = {'timestamp': 1433246400.123456, 'id': 42}
+        self.assertEqual(decode_cursor(encode_cursor(event)), (1433246400.123456, 42))
+        self.assertRaises(ValueError, decode_cursor, 'no cursor')
+
+    def test_event_name_is_literal_without_prefix(self):
+        self.assertEqual(self.names(event_name = 'OnDTMF_"**66*"'), ['OnDTMF_"**66*"'])
+        self.assertEqual(self.names(event_name = '~OnKeyPressed_*'), ['OnKeyPressed_11', 'OnKeyPressed_13'])
+
+    def test_time_range(self):
+        self.assertEqual(self.names(start = 101.0), ['OnDTMF_"**66*"', 'OnDTMF_"**6612*"'])
+        self.assertEqual(self.names(end = 101.0), ['OnKeyPressed_11', 'OnKeyPressed_13'])
+        self.assertEqual(parse_time('1433246400'), 1433246400.0)
+        self.assertRaises(ValueError, parse_time, 'yesterday')
+
+class ExcludeTest(unittest.TestCase):
+
+    def test_only_marked_names_are_patterns(self):
+        journal = EventJournal(':memory:', None, None, exclude = ['~OnTime*', 'OnDTMF_*'])
+        self.assertTrue(journal.excluded('OnTimeSecond'))
+        self.assertTrue(journal.excluded('OnDTMF_*'))
+        self.assertFalse(journal.excluded('OnDTMF_#'))
+        self.assertFalse(journal.excluded('OnKeyPressed_11'))
+
+class LimitTest(unittest.TestCase):
+
+    def test_limit(self):
+        self.assertEqual(parse_limit('5'), 5)
+        self.assertEqual(parse_limit(str(MAX_JOURNAL_LIMIT + 1)), MAX_JOURNAL_LIMIT)
+        self.assertRaises(ValueError, parse_limit, '0')
+        self.assertRaises(ValueError, parse_limit, '-1')
+        self.assertRaises(ValueError, parse_limit, 'all')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import logging
+import ConfigParser
+import StringIO
+
+from conf.config_object import ConfigObject
+from log.pipeline import configure_logging
+
+def config_of(text):
+    config = ConfigParser.ConfigParser()
+    config.readfp(StringIO.StringIO(text))
+    return ConfigObject(config)
+
+class ConfigureLoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root_level = logging.getLogger('').level
+
+    def tearDown(self):
+        configure_logging(config_of('[Logging]\nlevel = INFO\n'))
+        logging.getLogger('').setLevel(self.root_level)
+
+    def test_removed_module_level_is_reset(self):
+        logging.getLogger('test.first')
+        logging.getLogger('test.second')
+        configure_logging(config_of('[LogLevels]\ntest.first = DEBUG\ntest.second = WARNING\n'))
+        self.assertEqual(logging.getLogger('test.first').level, logging.DEBUG)
+        self.assertEqual(logging.getLogger('test.second').level, logging.WARNING)
+
+        # reload without test.first - as after a fresh start
+        configure_logging(config_of('[LogLevels]\ntest.second = ERROR\n'))
+        self.assertEqual(logging.getLogger('test.first').level, logging.NOTSET)
+        self.assertEqual(logging.getLogger('test.second').level, logging.ERROR)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+
+from action.scheduler import Scheduler
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_jobs_run_in_order(self):
+        scheduler = Scheduler()
+        fired, finished = [], threading.Event()
+        def append(number):
+            fired.append(number)
+            if len(fired) == 3: finished.set()
+        scheduler.add_job_in(0.03, append, (3,))
+        scheduler.add_job_in(0.01, append, (1,))
+        scheduler.add_job_in(0.02, append, (2,))
+        self.assertTrue(finished.wait(2))
+        self.assertEqual(fired, [1, 2, 3])
+        scheduler.destroy()
+
+    def test_no_jobs_after_destroy(self):
+        scheduler = Scheduler()
+        scheduler.destroy()
+        self.assertEqual(scheduler.add_job_in(0, lambda: None), None)
+        self.assertEqual(scheduler.jobs, [])
+        # a second destroy must not close the (maybe reused) fds again
+        scheduler.destroy()
+
+if __name__ == '__main__':
+    unittest.main()